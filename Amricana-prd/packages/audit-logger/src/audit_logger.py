@@ -2,13 +2,41 @@
 # HIPAA: Comprehensive audit logging with 7-year retention
 # SECURITY: Tracks all data access and modifications
 
-from typing import Optional, Dict, Any, List
-from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, BinaryIO, Iterator, List, Mapping, Tuple
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
 from enum import Enum
+from itertools import count, islice
+from operator import attrgetter, eq
+from types import MappingProxyType
+import atexit
+import bisect
+import csv
+import functools
+import io
 import json
-import uuid
 import hashlib
+import hmac
+import mmap
 import os
+import queue
+import secrets
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # Optional: faster JSON encoding when installed
+    orjson = None
+
+try:
+    import blake3
+except ImportError:  # Optional: AUDIT_HASH=blake3 requires it
+    blake3 = None
 
 
 class AuditAction(str, Enum):
@@ -51,12 +79,240 @@ class SeverityLevel(str, Enum):
     CRITICAL = "critical"
 
 
+# Log ids are a random per-process prefix plus a monotonic counter: unique
+# across processes without reading the OS random source for every entry
+_id_prefix = secrets.token_hex(8)
+_id_counter = count()
+
+
+def _reset_id_source():
+    """Draw a fresh id prefix so forked workers never reuse the parent's ids"""
+    global _id_prefix, _id_counter
+    _id_prefix = secrets.token_hex(8)
+    _id_counter = count()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_id_source)
+
+
+# Timestamps are held as integer nanoseconds since the Unix epoch (UTC);
+# datetimes are only built when a caller asks for one
+_EPOCH = datetime(1970, 1, 1)
+_NS_PER_DAY = 86_400 * 1_000_000_000
+
+
+def _datetime_to_ns(value: datetime) -> int:
+    """Nanoseconds since the epoch for a naive-UTC or timezone-aware datetime"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def _ns_to_datetime(value: int) -> datetime:
+    """Naive UTC datetime (as datetime.utcnow() returns) for epoch nanoseconds"""
+    return _EPOCH + timedelta(microseconds=value // 1000)
+
+
+# Column order for CSV exports
+_CSV_HEADER = ("id", "timestamp", "user_id", "action", "resource_type", "resource_id", "severity")
+
+# Streaming exports: supported formats and logs encoded per write
+STREAM_EXPORT_FORMATS = ("ndjson", "json", "csv")
+EXPORT_CHUNK_SIZE = 1000
+
+
+def _csv_bytes(rows) -> bytes:
+    """Encode rows as CSV; csv handles quoting"""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def _json_default(obj: Any) -> Any:
+    """Encoder hook: audit logs serialize straight from their fields"""
+    if isinstance(obj, AuditLog):
+        return obj._json_fields()
+    if isinstance(obj, MappingProxyType):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _json_dumps(obj: Any, indent: bool = False) -> str:
+    """Serialize to a JSON string, using orjson when it is installed"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=_json_default, option=option).decode()
+    return json.dumps(obj, default=_json_default, indent=2 if indent else None)
+
+
+def _json_loads(data: bytes) -> Any:
+    """Parse JSON from bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_line(obj: Any) -> bytes:
+    """Serialize to one newline-terminated UTF-8 JSON line"""
+    if orjson is not None:
+        return orjson.dumps(
+            obj, default=_json_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+        )
+    return (json.dumps(obj, default=_json_default) + "\n").encode("utf-8")
+
+
+# Compact integer codes for the enum columns of the log store
+_ACTION_CODES = {member: code for code, member in enumerate(AuditAction)}
+_RESOURCE_CODES = {member: code for code, member in enumerate(ResourceType)}
+_SEVERITY_CODES = {member: code for code, member in enumerate(SeverityLevel)}
+
+# Member for each enum member or plain value string ("read" -> AuditAction.READ)
+_ACTION_MEMBERS = {member: member for member in AuditAction}
+_RESOURCE_MEMBERS = {member: member for member in ResourceType}
+_SEVERITY_MEMBERS = {member: member for member in SeverityLevel}
+
+
+def _enum_member(members: Dict[Any, Any], value: Any, field: str) -> Any:
+    """Resolve value to its enum member, rejecting values outside the enum"""
+    member = members.get(value)
+    if member is None:
+        raise ValueError(f"HIPAA: unknown audit log {field}: {value!r}")
+    return member
+
+# Plain str value of each enum member, interned. Enum.value is a descriptor call;
+# a dict lookup is several times cheaper on the serialization paths, and interned
+# values compare by identity when used as dict keys. The str mixin makes
+# plain-string values (e.g. severity="info") resolve too
+_ENUM_VALUES = {
+    member: sys.intern(member.value)
+    for enum_type in (AuditAction, ResourceType, SeverityLevel)
+    for member in enum_type
+}
+
+# Pre-encoded enum values for checksum input
+_VALUE_BYTES = {member: value.encode() for member, value in _ENUM_VALUES.items()}
+
+# Checksum algorithms (AUDIT_HASH); all produce 32-byte digests.
+# sha256 is for FIPS deployments; blake3 needs the optional blake3 package
+HASH_ALGORITHMS = ("blake2b", "sha256", "blake3")
+
+
+def _resolve_hasher(name: str, key: bytes = b""):
+    """
+    Return a no-argument constructor for the named checksum hash
+    SECURITY: With a key the checksum is a MAC (HMAC-SHA256, or the native keyed
+    mode of BLAKE2b/BLAKE3), so the chain cannot be recomputed without the key
+    """
+    if name == "blake2b":
+        if key:
+            return functools.partial(hashlib.blake2b, digest_size=32, key=hashlib.sha256(key).digest())
+        return functools.partial(hashlib.blake2b, digest_size=32)
+    if name == "sha256":
+        if key:
+            return functools.partial(hmac.new, key, digestmod=hashlib.sha256)
+        return hashlib.sha256
+    if name == "blake3":
+        if blake3 is None:
+            raise ValueError("SECURITY: AUDIT_HASH=blake3 requires the blake3 package")
+        if key:
+            return functools.partial(blake3.blake3, key=hashlib.sha256(key).digest())
+        return blake3.blake3
+    raise ValueError(
+        f"SECURITY: Unknown audit hash '{name}'. "
+        f"Expected one of: {', '.join(HASH_ALGORITHMS)}"
+    )
+
+
+HASH_ALGORITHM = os.getenv("AUDIT_HASH", "blake2b")
+# Built once with the key schedule already applied (for HMAC, both the inner and
+# outer pads); each checksum copies it instead of constructing a hasher
+_hasher_template = _resolve_hasher(HASH_ALGORITHM, os.getenv("AUDIT_HMAC_KEY", "").encode())()
+
+
+def _new_hasher():
+    """Fresh hasher for the configured checksum algorithm"""
+    return _hasher_template.copy()
+
+
+# Schema tag heading every entry checksum input; separates entry digests from
+# other uses of the hash (Merkle nodes) and from future layouts. Absorbed once
+# into the entry template, so per-entry copies start past it
+CHECKSUM_SCHEMA = b"BRAINSAIT-AUDIT-v2|"
+_entry_hasher_template = _hasher_template.copy()
+_entry_hasher_template.update(CHECKSUM_SCHEMA)
+
+
+# Fixed-width head of the checksum input: previous digest (zero-filled for the
+# first entry), the timestamp as a signed 64-bit integer, then the byte length
+# of each variable field that follows (user_id, action, resource_type,
+# resource_id, severity). Length prefixes make the encoding unambiguous: no
+# field content can be shifted into its neighbour with the same digest
+_CHECKSUM_HEAD = struct.Struct("<32sqIBBIB")
+
+_timestamp_key = attrgetter("timestamp_ns")
+_digest_of = attrgetter("digest")
+_prev_digest_of = attrgetter("prev_digest")
+
+
+def _time_window(
+    logs: List["AuditLog"],
+    from_ns: Optional[int],
+    to_ns: Optional[int]
+) -> Tuple[int, int]:
+    """Index range of logs (appended in time order) with from_ns <= timestamp <= to_ns"""
+    lo = bisect.bisect_left(logs, from_ns, key=_timestamp_key) if from_ns is not None else 0
+    hi = bisect.bisect_right(logs, to_ns, key=_timestamp_key) if to_ns is not None else len(logs)
+    return lo, max(lo, hi)  # from_ns > to_ns is an empty window, not an inverted one
+
+
+# get_logs masks the columns instead of walking an index bucket when the bucket
+# holds more than 1/_COLUMN_SCAN_RATIO of the rows in the date window
+_COLUMN_SCAN_RATIO = 32
+
+# In-memory bound applied by default when logs are persisted to disk; older
+# entries stay available through AuditLogger.read_persisted_logs
+DEFAULT_MAX_LOGS_IN_MEMORY = 100_000
+
+# Entries per Merkle batch; each full batch is sealed with one root digest
+MERKLE_BATCH_SIZE = 128
+
+
+def _merkle_root(leaves: List[bytes]) -> bytes:
+    """Merkle root over leaf digests (an odd node is carried up unchanged)"""
+    level = leaves
+    while len(level) > 1:
+        parents = []
+        for i in range(0, len(level) - 1, 2):
+            hasher = _new_hasher()
+            hasher.update(b"\x01")  # interior-node domain separator
+            hasher.update(level[i])
+            hasher.update(level[i + 1])
+            parents.append(hasher.digest())
+        if len(level) % 2:
+            parents.append(level[-1])
+        level = parents
+    return level[0]
+
+
+# Shared read-only details for entries logged without any; avoids a dict per entry
+_EMPTY_DETAILS: Mapping[str, Any] = MappingProxyType({})
+
+
 class AuditLog:
     """
     HIPAA: Individual audit log entry
-    Includes checksum for tamper detection
+    Includes checksum for tamper detection; the checksum covers the previous
+    entry's checksum, so removing or reordering entries breaks the chain
     """
     
+    __slots__ = (
+        "id", "timestamp_ns", "user_id", "action", "resource_type", "resource_id",
+        "details", "ip_address", "user_agent", "severity", "prev_digest", "digest",
+        "_line"
+    )
+    
     def __init__(
         self,
         user_id: str,
@@ -66,49 +322,423 @@ class AuditLog:
         details: Optional[Dict[str, Any]] = None,
         ip_address: Optional[str] = None,
         user_agent: Optional[str] = None,
-        severity: SeverityLevel = SeverityLevel.INFO
+        severity: SeverityLevel = SeverityLevel.INFO,
+        prev_digest: bytes = b"",
+        timestamp_ns: Optional[int] = None
     ):
-        self.id = str(uuid.uuid4())
-        self.timestamp = datetime.utcnow()
+        self.id = f"{_id_prefix}-{next(_id_counter):016x}"
+        self.timestamp_ns = time.time_ns() if timestamp_ns is None else timestamp_ns
         self.user_id = user_id
-        self.action = action
-        self.resource_type = resource_type
+        # Checksums, serialization and the log store all key on enum members
+        self.action = _enum_member(_ACTION_MEMBERS, action, "action")
+        self.resource_type = _enum_member(_RESOURCE_MEMBERS, resource_type, "resource_type")
         self.resource_id = resource_id
-        self.details = details or {}
+        self.details: Mapping[str, Any] = details or _EMPTY_DETAILS
         self.ip_address = ip_address
         self.user_agent = user_agent
-        self.severity = severity
-        self.checksum = self._generate_checksum()
+        self.severity = _enum_member(_SEVERITY_MEMBERS, severity, "severity")
+        # Raw digests; hex is produced only when serializing
+        self.prev_digest = prev_digest
+        self.digest = self._generate_checksum()
+        self._line: Optional[bytes] = None
+    
+    def _generate_checksum(self) -> bytes:
+        """SECURITY: Generate checksum for audit log integrity, chained to the previous entry"""
+        # One struct head plus the raw fields, joined into a single buffer and
+        # hashed in one call; enums hash by value rather than by their
+        # (Python-version dependent) str()
+        user_id = self.user_id.encode()
+        action = _VALUE_BYTES[self.action]
+        resource_type = _VALUE_BYTES[self.resource_type]
+        resource_id = self.resource_id.encode()
+        severity = _VALUE_BYTES[self.severity]
+        hasher = _entry_hasher_template.copy()
+        hasher.update(b"".join((
+            _CHECKSUM_HEAD.pack(
+                self.prev_digest, self.timestamp_ns, len(user_id), len(action),
+                len(resource_type), len(resource_id), len(severity)
+            ),
+            user_id, action, resource_type, resource_id, severity
+        )))
+        return hasher.digest()
+    
+    @property
+    def checksum(self) -> str:
+        """Hex checksum of this entry"""
+        return self.digest.hex()
     
-    def _generate_checksum(self) -> str:
-        """SECURITY: Generate checksum for audit log integrity"""
-        data = f"{self.timestamp.isoformat()}{self.user_id}{self.action}{self.resource_type}{self.resource_id}"
-        return hashlib.sha256(data.encode()).hexdigest()
+    @property
+    def prev_checksum(self) -> str:
+        """Hex checksum of the previous entry in the chain ('' for the first)"""
+        return self.prev_digest.hex()
+    
+    @property
+    def timestamp(self) -> datetime:
+        """Creation time as a naive UTC datetime"""
+        return _ns_to_datetime(self.timestamp_ns)
+    
+    @timestamp.setter
+    def timestamp(self, value: datetime):
+        self.timestamp_ns = _datetime_to_ns(value)
+        self._line = None
     
     def verify_integrity(self) -> bool:
         """SECURITY: Verify audit log has not been tampered with"""
-        expected_checksum = self._generate_checksum()
-        return self.checksum == expected_checksum
+        if hmac.compare_digest(self.digest, self._generate_checksum()):
+            return True
+        self._line = None  # Re-render a modified entry rather than serve the cached form
+        return False
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert audit log to dictionary"""
         return {
             "id": self.id,
             "timestamp": self.timestamp.isoformat(),
+            "timestamp_ns": self.timestamp_ns,
             "user_id": self.user_id,
-            "action": self.action.value,
-            "resource_type": self.resource_type.value,
+            "action": _ENUM_VALUES[self.action],
+            "resource_type": _ENUM_VALUES[self.resource_type],
             "resource_id": self.resource_id,
-            "details": self.details,
+            "details": self.details or {},
             "ip_address": self.ip_address,
             "user_agent": self.user_agent,
-            "severity": self.severity.value,
+            "severity": _ENUM_VALUES[self.severity],
+            "prev_checksum": self.prev_checksum,
             "checksum": self.checksum
         }
     
+    def to_row(self) -> Tuple[str, ...]:
+        """CSV export row, in _CSV_HEADER order"""
+        return (self.id, self.timestamp.isoformat(), self.user_id, _ENUM_VALUES[self.action],
+                _ENUM_VALUES[self.resource_type], self.resource_id, _ENUM_VALUES[self.severity])
+    
     def to_json(self) -> str:
         """Convert audit log to JSON string"""
-        return json.dumps(self.to_dict())
+        return _json_dumps(self)
+    
+    def json_line(self) -> bytes:
+        """
+        Compact JSON for this entry plus a newline, rendered once
+        Entries are immutable once logged, so persistence and every later
+        export share the same bytes
+        """
+        line = self._line
+        if line is None:
+            line = self._line = _json_line(self)
+        return line
+    
+    def _json_fields(self) -> Dict[str, Any]:
+        """
+        to_dict() for the JSON encoders: orjson serializes datetimes and enums
+        natively (same output), so the isoformat() and value lookups are skipped
+        """
+        if orjson is None:
+            return self.to_dict()
+        return {
+            "id": self.id,
+            "timestamp": self.timestamp,
+            "timestamp_ns": self.timestamp_ns,
+            "user_id": self.user_id,
+            "action": self.action,
+            "resource_type": self.resource_type,
+            "resource_id": self.resource_id,
+            "details": self.details or {},
+            "ip_address": self.ip_address,
+            "user_agent": self.user_agent,
+            "severity": self.severity,
+            "prev_checksum": self.prev_checksum,
+            "checksum": self.checksum
+        }
+
+
+class _LogColumns:
+    """
+    Struct-of-arrays copy of the queryable fields of each stored log
+    Row i describes AuditLogger.logs[i]; lets queries filter with vectorized compares.
+    User ids are interned to int32 codes.
+    """
+    
+    __slots__ = ("timestamps", "users", "actions", "resource_types", "severities",
+                 "user_codes", "size")
+    
+    _COLUMNS = ("timestamps", "users", "actions", "resource_types", "severities")
+    
+    def __init__(self, capacity: int = 1024):
+        self.timestamps = np.empty(capacity, dtype=np.int64)
+        self.users = np.empty(capacity, dtype=np.int32)
+        self.actions = np.empty(capacity, dtype=np.uint8)
+        self.resource_types = np.empty(capacity, dtype=np.uint8)
+        self.severities = np.empty(capacity, dtype=np.uint8)
+        self.user_codes: Dict[str, int] = {}
+        self.size = 0
+    
+    def append(self, audit_log: AuditLog):
+        """Append the codes of a log, doubling capacity when full"""
+        if self.size == len(self.actions):
+            self._grow(2 * len(self.actions))
+        user_code = self.user_codes.setdefault(audit_log.user_id, len(self.user_codes))
+        self.timestamps[self.size] = audit_log.timestamp_ns
+        self.users[self.size] = user_code
+        self.actions[self.size] = _ACTION_CODES[audit_log.action]
+        self.resource_types[self.size] = _RESOURCE_CODES[audit_log.resource_type]
+        self.severities[self.size] = _SEVERITY_CODES[audit_log.severity]
+        self.size += 1
+    
+    def window(self, from_ns: Optional[int], to_ns: Optional[int]) -> Tuple[int, int]:
+        """Row range with from_ns <= timestamp <= to_ns (rows are in time order)"""
+        timestamps = self.timestamps[:self.size]
+        lo = int(np.searchsorted(timestamps, from_ns, "left")) if from_ns is not None else 0
+        hi = int(np.searchsorted(timestamps, to_ns, "right")) if to_ns is not None else self.size
+        return lo, max(lo, hi)  # from_ns > to_ns is an empty window, not an inverted one
+    
+    def select(
+        self,
+        user_id: Optional[str] = None,
+        action: Optional[AuditAction] = None,
+        resource_type: Optional[ResourceType] = None,
+        severity: Optional[SeverityLevel] = None,
+        start: int = 0,
+        stop: Optional[int] = None
+    ) -> np.ndarray:
+        """Return positions (ascending) of rows in [start, stop) matching the given codes"""
+        stop = self.size if stop is None else max(start, stop)
+        mask = np.ones(stop - start, dtype=bool)
+        if user_id:
+            user_code = self.user_codes.get(user_id)
+            if user_code is None:
+                return np.empty(0, dtype=np.intp)
+            mask &= self.users[start:stop] == user_code
+        for column, codes, value in (
+            (self.actions, _ACTION_CODES, action),
+            (self.resource_types, _RESOURCE_CODES, resource_type),
+            (self.severities, _SEVERITY_CODES, severity)
+        ):
+            if value:
+                code = codes.get(value)
+                if code is None:
+                    # No stored log carries a value outside the enum
+                    return np.empty(0, dtype=np.intp)
+                mask &= column[start:stop] == code
+        return np.flatnonzero(mask) + start
+    
+    def _grow(self, capacity: int):
+        for name in self._COLUMNS:
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+
+# fsync strategies for the audit log file:
+#   every    - write and fsync each entry before log() returns (strictest, slowest)
+#   interval - background fsync at most every fsync_interval seconds
+#   size     - fsync once fsync_batch entries are pending
+FSYNC_POLICIES = ("every", "interval", "size")
+
+# Buffered policies hand entries to a writer thread; a full queue blocks the
+# caller rather than dropping audit entries
+WRITE_QUEUE_SIZE = 10_000
+WRITE_BATCH_SIZE = 500
+
+
+def _write_all(fd: int, data: bytes):
+    """os.write until all of data is written (writes may be partial)"""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+class _AuditLogWriter:
+    """
+    SECURITY: Append-only audit log file (one JSON entry per line)
+    Under the buffered fsync policies a background thread coalesces queued
+    entries into a single write; fsync is batched according to fsync_policy
+    """
+    
+    def __init__(
+        self,
+        directory: str,
+        fsync_policy: str = "interval",
+        fsync_interval: float = 0.1,
+        fsync_batch: int = 64
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.file_path = os.path.join(directory, "audit.log")
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.fsync_batch = fsync_batch
+        self._fd = os.open(self.file_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._closed = threading.Event()
+        # Held while handing an entry to the file or queue, and by close(), so
+        # no entry lands in a queue nobody drains or on a closed descriptor
+        self._state_lock = threading.Lock()
+        # First failure of the writer thread since the last flush()/close(),
+        # re-raised to the caller of either
+        self._error: Optional[BaseException] = None
+        self._queue: Optional[queue.Queue] = None
+        self._writer_thread: Optional[threading.Thread] = None
+        
+        if fsync_policy != "every":
+            self._queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+            self._writer_thread = threading.Thread(
+                target=self._drain, name="audit-log-writer", daemon=True
+            )
+            self._writer_thread.start()
+        
+        atexit.register(self.close)
+    
+    def write(self, line: bytes):
+        """Append one serialized entry"""
+        with self._state_lock:
+            if not self._closed.is_set():
+                if self._queue is not None:
+                    self._queue.put(line)
+                else:
+                    self._write_lines((line,))
+                    self._sync()
+                return
+        # Closed (e.g. an entry logged from another atexit handler): append
+        # and fsync it directly rather than dropping it
+        fd = os.open(self.file_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            _write_all(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    
+    def wait_for_writes(self):
+        """Block until every queued entry has reached the file"""
+        if self._queue is not None:
+            self._queue.join()
+    
+    def flush(self):
+        """Write queued entries and fsync everything written since the last sync"""
+        self.wait_for_writes()
+        self._sync()
+        self._raise_pending_error()
+    
+    def close(self):
+        """Flush pending entries and close the file"""
+        with self._state_lock:
+            if self._closed.is_set():
+                return
+            self._closed.set()
+            if self._writer_thread is not None:
+                self._queue.put(None)
+        if self._writer_thread is not None:
+            self._writer_thread.join()
+        try:
+            self._sync()
+        finally:
+            os.close(self._fd)
+            atexit.unregister(self.close)
+        self._raise_pending_error()
+    
+    def _raise_pending_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+    
+    def _write_lines(self, lines):
+        data = b"".join(lines)
+        with self._lock:
+            _write_all(self._fd, data)
+            self._unsynced += len(lines)
+    
+    def _sync(self):
+        with self._lock:
+            pending, self._unsynced = self._unsynced, 0
+        if pending:
+            os.fsync(self._fd)
+    
+    def _drain(self):
+        """Writer thread: up to WRITE_BATCH_SIZE entries per write, fsync per policy"""
+        last_sync = time.monotonic()
+        while True:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.fsync_interval))
+                while len(batch) < WRITE_BATCH_SIZE:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            
+            lines = [line for line in batch if line is not None]
+            try:
+                if lines:
+                    self._write_lines(lines)
+                
+                now = time.monotonic()
+                if (
+                    self.fsync_policy == "interval" and now - last_sync >= self.fsync_interval
+                ) or (
+                    self.fsync_policy == "size" and self._unsynced >= self.fsync_batch
+                ):
+                    self._sync()
+                    last_sync = now
+            except Exception as e:
+                # Keep draining: a dead writer thread would leave flush() blocked
+                # on the queue and every later entry unwritten
+                if self._error is None:
+                    self._error = e
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(lines) < len(batch):
+                return
+
+
+def _entry_ns(entry: Dict[str, Any]) -> int:
+    """Timestamp of a persisted entry; entries written before timestamp_ns existed carry only ISO time"""
+    if "timestamp_ns" in entry:
+        return entry["timestamp_ns"]
+    return _datetime_to_ns(datetime.fromisoformat(entry["timestamp"]))
+
+
+def _first_entry_at(mm: mmap.mmap, end: int, target_ns: int) -> int:
+    """
+    Offset of the first line in mm[:end] with timestamp >= target_ns
+    Entries are appended in time order, so this is a binary search over line starts
+    """
+    lo, hi = 0, end
+    while lo < hi:
+        mid = (lo + hi) // 2
+        line_start = mm.rfind(b"\n", 0, mid) + 1
+        line_end = mm.find(b"\n", line_start, end)
+        if _entry_ns(_json_loads(mm[line_start:line_end])) < target_ns:
+            lo = line_end + 1
+        else:
+            hi = line_start
+    return lo
+
+
+def _read_log_file(
+    file_path: str,
+    from_ns: Optional[int] = None,
+    to_ns: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """Stream entries from an audit log file via mmap, oldest first"""
+    try:
+        log_file = open(file_path, "rb")
+    except FileNotFoundError:
+        return
+    with log_file:
+        size = os.fstat(log_file.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(log_file.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            # Ignore a trailing entry that is still being written
+            end = mm.rfind(b"\n") + 1
+            pos = _first_entry_at(mm, end, from_ns) if from_ns is not None else 0
+            while pos < end:
+                line_end = mm.find(b"\n", pos, end)
+                entry = _json_loads(mm[pos:line_end])
+                pos = line_end + 1
+                if to_ns is not None and _entry_ns(entry) > to_ns:
+                    return
+                yield entry
 
 
 class AuditLogger:
@@ -117,10 +747,52 @@ class AuditLogger:
     Implements comprehensive audit trail with 7-year retention
     """
     
-    def __init__(self, storage_path: Optional[str] = None):
+    def __init__(
+        self,
+        storage_path: Optional[str] = None,
+        fsync_policy: Optional[str] = None,
+        max_logs: Optional[int] = None
+    ):
         self.logs: List[AuditLog] = []
-        self.storage_path = storage_path or os.getenv("AUDIT_LOG_PATH", "/var/log/ssdp/audit")
+        # Secondary indexes so filtered queries touch only matching logs
+        self._by_user: Dict[str, List[AuditLog]] = defaultdict(list)
+        self._by_resource: Dict[Tuple[ResourceType, str], List[AuditLog]] = defaultdict(list)
+        self._by_action: Dict[AuditAction, List[AuditLog]] = defaultdict(list)
+        self._by_id: Dict[str, AuditLog] = {}
+        self._columns = _LogColumns()
+        # Merkle roots of sealed batches, keyed by batch number; batch n covers
+        # sequence numbers [n * MERKLE_BATCH_SIZE, (n + 1) * MERKLE_BATCH_SIZE)
+        self._batch_roots: Dict[int, bytes] = {}
+        self._seq_offset = 0  # sequence number of self.logs[0]
+        # Serializes appends (and cleanup) so the chain and stamps stay in log order
+        self._lock = threading.Lock()
+        configured_path = storage_path or os.getenv("AUDIT_LOG_PATH")
+        self.storage_path = configured_path or "/var/log/ssdp/audit"
         self.retention_years = 7  # HIPAA/PDPL requirement
+        
+        self.fsync_policy = fsync_policy or os.getenv("AUDIT_FSYNC_POLICY", "interval")
+        if self.fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(
+                f"SECURITY: Unknown fsync policy '{self.fsync_policy}'. "
+                f"Expected one of: {', '.join(FSYNC_POLICIES)}"
+            )
+        
+        # Logs are written to disk only when a storage path is configured
+        self._writer: Optional[_AuditLogWriter] = None
+        if configured_path:
+            self._writer = _AuditLogWriter(configured_path, self.fsync_policy)
+        
+        # Cap on logs held in memory. Unpersisted logs exist only here, so they
+        # are unbounded unless a cap is given explicitly
+        if max_logs is None and os.getenv("AUDIT_MAX_LOGS_IN_MEMORY"):
+            max_logs = int(os.environ["AUDIT_MAX_LOGS_IN_MEMORY"])
+        if max_logs is None and self._writer:
+            max_logs = DEFAULT_MAX_LOGS_IN_MEMORY
+        if max_logs is not None and max_logs < 2 * MERKLE_BATCH_SIZE:
+            raise ValueError(
+                f"SECURITY: max_logs must be at least {2 * MERKLE_BATCH_SIZE}"
+            )
+        self.max_logs = max_logs
     
     def log(
         self,
@@ -136,21 +808,40 @@ class AuditLogger:
         """
         SECURITY: Log an action with comprehensive details
         """
-        audit_log = AuditLog(
-            user_id=user_id,
-            action=action,
-            resource_type=resource_type,
-            resource_id=resource_id,
-            details=details,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            severity=severity
-        )
-        
-        self.logs.append(audit_log)
-        self._persist_log(audit_log)
-        
-        return audit_log
+        # The chain link, timestamp clamp, store appends and file write form one
+        # step: concurrent callers must not fork the chain or reorder the file
+        with self._lock:
+            timestamp_ns = time.time_ns()
+            if self.logs and timestamp_ns <= self.logs[-1].timestamp_ns:
+                # The wall clock can step back (NTP); the date-window bisects rely
+                # on stamps increasing in append order
+                timestamp_ns = self.logs[-1].timestamp_ns + 1
+            audit_log = AuditLog(
+                user_id=user_id,
+                action=action,
+                resource_type=resource_type,
+                resource_id=resource_id,
+                details=details,
+                ip_address=ip_address,
+                user_agent=user_agent,
+                severity=severity,
+                prev_digest=self.logs[-1].digest if self.logs else b"",
+                timestamp_ns=timestamp_ns
+            )
+            
+            self.logs.append(audit_log)
+            self._index_log(audit_log)
+            self._columns.append(audit_log)
+            self._persist_log(audit_log)
+            
+            if (self._seq_offset + len(self.logs)) % MERKLE_BATCH_SIZE == 0:
+                self._seal_batch()
+            
+            if self.max_logs is not None and len(self.logs) > self.max_logs:
+                # Evict the oldest tenth at once so the store rebuild is amortized
+                self._replace_logs(self.logs[len(self.logs) - self.max_logs + self.max_logs // 10:])
+            
+            return audit_log
     
     def log_data_access(
         self,
@@ -216,33 +907,69 @@ class AuditLogger:
         action: Optional[AuditAction] = None,
         from_date: Optional[datetime] = None,
         to_date: Optional[datetime] = None,
-        limit: int = 100
+        limit: int = 100,
+        severity: Optional[SeverityLevel] = None
     ) -> List[AuditLog]:
         """Query audit logs with filters"""
-        filtered_logs = self.logs
+        from_ns = _datetime_to_ns(from_date) if from_date else None
+        # datetimes carry microseconds; include every ns within the final microsecond
+        to_ns = _datetime_to_ns(to_date) + 999 if to_date else None
         
+        # Start from the smallest index bucket matching the filters
+        candidates: Optional[List[AuditLog]] = None
         if user_id:
-            filtered_logs = [log for log in filtered_logs if log.user_id == user_id]
-        
-        if resource_type:
-            filtered_logs = [log for log in filtered_logs if log.resource_type == resource_type]
-        
-        if resource_id:
-            filtered_logs = [log for log in filtered_logs if log.resource_id == resource_id]
-        
+            candidates = self._by_user.get(user_id, [])
+        if resource_type and resource_id:
+            bucket = self._by_resource.get((resource_type, resource_id), [])
+            if candidates is None or len(bucket) < len(candidates):
+                candidates = bucket
         if action:
-            filtered_logs = [log for log in filtered_logs if log.action == action]
+            bucket = self._by_action.get(action, [])
+            if candidates is None or len(bucket) < len(candidates):
+                candidates = bucket
         
-        if from_date:
-            filtered_logs = [log for log in filtered_logs if log.timestamp >= from_date]
+        # Logs (and index buckets) are appended in time order: the date range is
+        # a contiguous slice found by binary search, and walking it backwards
+        # yields newest-first results and stops as soon as limit is reached
+        lo, hi = self._columns.window(from_ns, to_ns)
+        column_filters = sum(1 for f in (user_id, action, resource_type, severity) if f)
+        if candidates is not None:
+            bucket_lo, bucket_hi = _time_window(candidates, from_ns, to_ns)
+            # A bucket narrowed by further column filters is cheaper to mask
+            # vectorized than to walk once it is a sizeable share of the window
+            if column_filters > 1 and (bucket_hi - bucket_lo) * _COLUMN_SCAN_RATIO > hi - lo:
+                candidates = None
         
-        if to_date:
-            filtered_logs = [log for log in filtered_logs if log.timestamp <= to_date]
+        if candidates is not None:
+            newest_first = (candidates[i] for i in range(bucket_hi - 1, bucket_lo - 1, -1))
+        elif column_filters:
+            positions = self._columns.select(
+                user_id=user_id, action=action, resource_type=resource_type,
+                severity=severity, start=lo, stop=hi
+            )
+            if not resource_id:
+                # The mask already applied every filter: no per-row predicates
+                return [self.logs[i] for i in positions[::-1][:limit].tolist()]
+            newest_first = (self.logs[i] for i in positions[::-1])
+        else:
+            newest_first = (self.logs[i] for i in range(hi - 1, lo - 1, -1))
         
-        # Sort by timestamp descending
-        filtered_logs.sort(key=lambda x: x.timestamp, reverse=True)
+        # Single pass with only the active filters: one attrgetter call and one
+        # tuple compare per row, instead of a test per possible filter
+        filters = [
+            (field, value) for field, value in (
+                ("resource_id", resource_id), ("user_id", user_id), ("action", action),
+                ("resource_type", resource_type), ("severity", severity)
+            ) if value
+        ]
+        if filters:
+            fields, target = zip(*filters)
+            key = attrgetter(*fields)
+            if len(fields) == 1:
+                target = target[0]
+            newest_first = (log for log in newest_first if key(log) == target)
         
-        return filtered_logs[:limit]
+        return list(islice(newest_first, limit))
     
     def export_logs(
         self,
@@ -251,42 +978,233 @@ class AuditLogger:
         format: str = "json"
     ) -> str:
         """HIPAA: Export audit logs for compliance reporting"""
+        if format == "csv":
+            return "".join(self.iter_export_csv(from_date, to_date, limit=10000))
+        
+        # The encoder hook serializes each AuditLog from its fields; no to_dict() pass
         logs = self.get_logs(from_date=from_date, to_date=to_date, limit=10000)
+        return _json_dumps(logs, indent=format == "json")
+    
+    def iter_export_csv(
+        self,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        batch: int = EXPORT_CHUNK_SIZE
+    ) -> Iterator[str]:
+        """
+        HIPAA: CSV export as text chunks of up to batch rows, newest first
+        One buffer is reused for every chunk, so memory stays O(batch)
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(_CSV_HEADER)
         
-        if format == "json":
-            return json.dumps([log.to_dict() for log in logs], indent=2)
-        elif format == "csv":
-            # Simple CSV export
-            csv_lines = ["id,timestamp,user_id,action,resource_type,resource_id,severity"]
-            for log in logs:
-                csv_lines.append(
-                    f"{log.id},{log.timestamp.isoformat()},{log.user_id},"
-                    f"{log.action.value},{log.resource_type.value},{log.resource_id},{log.severity.value}"
-                )
-            return "\n".join(csv_lines)
+        logs = islice(self._newest_first(from_date, to_date), limit)
+        for chunk in iter(lambda: list(islice(logs, batch)), []):
+            writer.writerows(log.to_row() for log in chunk)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        
+        if buffer.tell():
+            yield buffer.getvalue()
+    
+    def stream_export(
+        self,
+        writer: BinaryIO,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        format: str = "ndjson"
+    ) -> int:
+        """
+        HIPAA: Export audit logs to a binary stream, newest first, without a row limit
+        Logs are encoded EXPORT_CHUNK_SIZE at a time, so memory use does not grow
+        with the export. Formats: ndjson (one entry per line), json (compact array), csv.
+        
+        Returns:
+            Number of logs written
+        """
+        if format not in STREAM_EXPORT_FORMATS:
+            raise ValueError(
+                f"Unknown export format '{format}'. "
+                f"Expected one of: {', '.join(STREAM_EXPORT_FORMATS)}"
+            )
+        
+        newest_first = self._newest_first(from_date, to_date)
+        
+        if format == "csv":
+            writer.write(_csv_bytes([_CSV_HEADER]))
+        elif format == "json":
+            writer.write(b"[")
         
-        return json.dumps([log.to_dict() for log in logs])
+        written = 0
+        for chunk in iter(lambda: list(islice(newest_first, EXPORT_CHUNK_SIZE)), []):
+            if format == "csv":
+                writer.write(_csv_bytes(log.to_row() for log in chunk))
+            elif format == "json":
+                if written:
+                    writer.write(b",")
+                writer.write(b",".join(log.json_line()[:-1] for log in chunk))
+            else:
+                writer.write(b"".join(log.json_line() for log in chunk))
+            written += len(chunk)
+        
+        if format == "json":
+            writer.write(b"]")
+        return written
+    
+    def read_persisted_logs(
+        self,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        HIPAA: Stream entries from the audit log file, oldest first
+        Covers history beyond what this process holds in memory (earlier runs,
+        other workers sharing the file); entries are parsed lazily and a from_date
+        is located by binary search, so the file is never loaded whole.
+        """
+        if not self._writer:
+            return iter(())
+        from_ns = _datetime_to_ns(from_date) if from_date else None
+        to_ns = _datetime_to_ns(to_date) + 999 if to_date else None
+        self._writer.wait_for_writes()
+        return _read_log_file(self._writer.file_path, from_ns, to_ns)
     
     def verify_log_integrity(self, log_id: str) -> bool:
         """SECURITY: Verify integrity of a specific log entry"""
-        log = next((log for log in self.logs if log.id == log_id), None)
+        log = self._by_id.get(log_id)
         if not log:
             return False
         return log.verify_integrity()
     
+    def verify_range(self, start: int = 0, end: Optional[int] = None) -> bool:
+        """
+        SECURITY: Verify the hash chain over logs[start:end]
+        Detects modified, deleted, inserted or reordered entries. The oldest
+        retained entry anchors the chain, since retention cleanup drops its predecessor.
+        """
+        end = len(self.logs) if end is None else min(end, len(self.logs))
+        if start < 0 or start >= end:
+            return start == end
+        
+        prev_digest = self.logs[start - 1].digest if start > 0 else self.logs[0].prev_digest
+        for audit_log in islice(self.logs, start, end):
+            if audit_log.prev_digest != prev_digest or not audit_log.verify_integrity():
+                return False
+            prev_digest = audit_log.digest
+        return True
+    
+    def verify_all(self) -> np.ndarray:
+        """
+        SECURITY: Per-entry integrity of every stored log, for full sweeps
+        Unlike verify_range, which stops at the first failure, this locates every
+        one: False marks an entry whose checksum does not match its fields or
+        whose link to the previous entry is broken.
+        
+        Returns:
+            Boolean array aligned with self.logs
+        """
+        logs = self.logs
+        ok = np.fromiter((log.verify_integrity() for log in logs), dtype=bool, count=len(logs))
+        if len(logs) > 1:
+            ok[1:] &= np.fromiter(
+                map(eq, map(_prev_digest_of, islice(logs, 1, None)), map(_digest_of, logs)),
+                dtype=bool, count=len(logs) - 1
+            )
+        return ok
+    
+    def get_batch_roots(self) -> Dict[int, str]:
+        """
+        SECURITY: Hex Merkle roots of sealed batches, for publishing or signing
+        One root attests MERKLE_BATCH_SIZE entries
+        """
+        return {batch: root.hex() for batch, root in self._batch_roots.items()}
+    
+    def verify_batch(self, batch: int) -> bool:
+        """SECURITY: Verify a sealed batch's entries and chain against its stored root"""
+        root = self._batch_roots.get(batch)
+        start = batch * MERKLE_BATCH_SIZE - self._seq_offset
+        if root is None or start < 0 or start + MERKLE_BATCH_SIZE > len(self.logs):
+            return False
+        if not self.verify_range(start, start + MERKLE_BATCH_SIZE):
+            return False
+        leaves = [log.digest for log in islice(self.logs, start, start + MERKLE_BATCH_SIZE)]
+        return hmac.compare_digest(_merkle_root(leaves), root)
+    
+    def _seal_batch(self):
+        """Compute the Merkle root of the batch completed by the latest entry"""
+        batch = (self._seq_offset + len(self.logs)) // MERKLE_BATCH_SIZE - 1
+        leaves = [log.digest for log in self.logs[-MERKLE_BATCH_SIZE:]]
+        self._batch_roots[batch] = _merkle_root(leaves)
+    
     def cleanup_old_logs(self):
         """HIPAA: Clean up logs older than retention period"""
-        cutoff_date = datetime.utcnow() - timedelta(days=self.retention_years * 365)
-        self.logs = [log for log in self.logs if log.timestamp >= cutoff_date]
+        cutoff_ns = time.time_ns() - self.retention_years * 365 * _NS_PER_DAY
+        with self._lock:
+            # Logs are appended in time order: expired entries are a prefix
+            expired = bisect.bisect_left(self.logs, cutoff_ns, key=_timestamp_key)
+            if expired:
+                self._replace_logs(self.logs[expired:])
+    
+    def _replace_logs(self, retained: List[AuditLog]):
+        """Keep only retained (the newest logs) in memory and rebuild the store"""
+        # Dropped entries are the oldest, so they come off the front of the sequence
+        self._seq_offset += len(self.logs) - len(retained)
+        self.logs = retained
+        first_batch = -(-self._seq_offset // MERKLE_BATCH_SIZE)
+        self._batch_roots = {
+            batch: root for batch, root in self._batch_roots.items() if batch >= first_batch
+        }
+        self._rebuild_store()
+    
+    def _newest_first(
+        self,
+        from_date: Optional[datetime],
+        to_date: Optional[datetime]
+    ) -> Iterator[AuditLog]:
+        """Stored logs within the date range, newest first"""
+        from_ns = _datetime_to_ns(from_date) if from_date else None
+        to_ns = _datetime_to_ns(to_date) + 999 if to_date else None
+        lo, hi = _time_window(self.logs, from_ns, to_ns)
+        return (self.logs[i] for i in range(hi - 1, lo - 1, -1))
+    
+    def _index_log(self, audit_log: AuditLog):
+        """Add a log entry to the secondary indexes"""
+        self._by_user[audit_log.user_id].append(audit_log)
+        self._by_resource[(audit_log.resource_type, audit_log.resource_id)].append(audit_log)
+        self._by_action[audit_log.action].append(audit_log)
+        self._by_id[audit_log.id] = audit_log
+    
+    def _rebuild_store(self):
+        """Rebuild the secondary indexes and enum columns from self.logs"""
+        self._by_user = defaultdict(list)
+        self._by_resource = defaultdict(list)
+        self._by_action = defaultdict(list)
+        self._by_id = {}
+        self._columns = _LogColumns(max(1024, len(self.logs)))
+        for audit_log in self.logs:
+            self._index_log(audit_log)
+            self._columns.append(audit_log)
+    
+    def flush(self):
+        """SECURITY: Force pending log entries to stable storage"""
+        if self._writer:
+            self._writer.flush()
+    
+    def close(self):
+        """Flush and close the audit log file"""
+        if self._writer:
+            self._writer.close()
     
     def _persist_log(self, audit_log: AuditLog):
         """
         SECURITY: Persist log to storage
-        In production, this should write to a secure database or file system
+        Appends the entry to the audit log file; durability follows fsync_policy
         """
-        # TODO: Implement actual persistence to database or secure file storage
-        # For now, just keep in memory
-        pass
+        if self._writer:
+            self._writer.write(audit_log.json_line())
 
 
 # Global audit logger instance
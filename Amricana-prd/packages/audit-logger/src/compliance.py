@@ -4,10 +4,106 @@
 # HIPAA: Healthcare compliance (for BrainSAIT integration)
 # NPHIES: National Platform for Health Insurance Exchange Services
 
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 from datetime import datetime
-import re
+from itertools import islice
+import hashlib
+import json
+import numbers
+import os
+import threading
+
+import numpy as np
+
+
+# Base64 alphabet (standard and URL-safe); bytes.translate deletes these,
+# so any byte left over marks a value that is not base64-encoded
+_BASE64_ALPHABET = (
+    b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=_-'
+)
+
+
+def _is_saudi_vat_number(value: str) -> bool:
+    """
+    ZATCA: 15 ASCII digits, starting with 3 and ending with 03
+    Fixed-width string tests run in C without the regex engine; isascii() keeps
+    out non-ASCII digits and there is no trailing-newline match as with '$'
+    """
+    return (
+        len(value) == 15
+        and value.isascii()
+        and value.isdigit()
+        and value[0] == '3'
+        and value.endswith('03')
+    )
+
+
+# ZATCA Phase 2 mandatory invoice fields
+ZATCA_REQUIRED_FIELDS = (
+    'invoice_number',
+    'issue_date',
+    'issue_time',
+    'supplier_vat_number',
+    'customer_name',
+    'line_items',
+    'total_excluding_vat',
+    'vat_amount',
+    'total_including_vat'
+)
+
+# Totals used by the VAT recalculation check
+ZATCA_VAT_FIELDS = ('total_excluding_vat', 'vat_amount', 'total_including_vat')
+
+# Bump when the ZATCA rules change so cached results from older rules are not reused
+ZATCA_RULES_VERSION = 1
+ZATCA_CACHE_SIZE = 4096
+
+# Batches smaller than this are validated in-process; below it, worker start-up
+# and pickling cost more than the validation itself
+ZATCA_PARALLEL_MIN_BATCH = 1000
+
+# PII fields that PDPL requires to be encrypted at rest
+PDPL_PII_FIELDS = (
+    'national_id',
+    'iqama_id',
+    'passport_number',
+    'phone',
+    'email',
+    'address',
+    'birth_date'
+)
+_PDPL_PII_FIELD_SET = frozenset(PDPL_PII_FIELDS)
+
+# Data types that require documented collection consent
+PDPL_CONSENT_DATA_TYPES = frozenset({'customer', 'outlet', 'employee'})
+
+# PHI fields that HIPAA requires to be encrypted
+HIPAA_PHI_FIELDS = (
+    'patient_id',
+    'medical_record_number',
+    'diagnosis',
+    'treatment',
+    'prescription',
+    'lab_results'
+)
+_HIPAA_PHI_FIELD_SET = frozenset(HIPAA_PHI_FIELDS)
+
+# NPHIES mandatory claim identifiers
+NPHIES_REQUIRED_FIELDS = (
+    'claim_id',
+    'patient_id',
+    'provider_id',
+    'service_date',
+    'diagnosis_code',
+    'service_code'
+)
+
+# BrainSAIT OID namespace for NPHIES patient identifiers; a prefix test,
+# so str.startswith rather than a regex
+BRAINSAIT_OID_PREFIX = 'urn:oid:1.3.6.1.4.1.61026'
 
 
 class ComplianceStandard(str, Enum):
@@ -21,6 +117,9 @@ class ComplianceStandard(str, Enum):
 class ComplianceViolation:
     """Represents a compliance violation"""
     
+    # Validators create one per finding; no per-instance __dict__
+    __slots__ = ("standard", "severity", "message", "field", "details", "timestamp")
+    
     def __init__(
         self,
         standard: ComplianceStandard,
@@ -37,6 +136,91 @@ class ComplianceViolation:
         self.timestamp = datetime.utcnow()
 
 
+# Severity buckets reported by get_compliance_report, most severe first
+VIOLATION_SEVERITIES = ('critical', 'high', 'medium', 'low')
+
+
+class _ViolationList(list):
+    """
+    List of violations that keeps per-severity and per-standard counts current
+    on every mutation, so the compliance report never walks the list
+    """
+    
+    __slots__ = ("by_severity", "by_standard")
+    
+    def __init__(self, violations=()):
+        super().__init__(violations)
+        self._recount()
+    
+    def _recount(self):
+        self.by_severity = Counter(v.severity for v in self)
+        self.by_standard = Counter(v.standard for v in self)
+    
+    def _add(self, violations):
+        for v in violations:
+            self.by_severity[v.severity] += 1
+            self.by_standard[v.standard] += 1
+    
+    def _discard(self, violations):
+        for v in violations:
+            self.by_severity[v.severity] -= 1
+            self.by_standard[v.standard] -= 1
+    
+    def append(self, violation):
+        super().append(violation)
+        self._add((violation,))
+    
+    def extend(self, violations):
+        violations = list(violations)
+        super().extend(violations)
+        self._add(violations)
+    
+    def __iadd__(self, violations):
+        self.extend(violations)
+        return self
+    
+    def insert(self, index, violation):
+        super().insert(index, violation)
+        self._add((violation,))
+    
+    def pop(self, index=-1):
+        violation = super().pop(index)
+        self._discard((violation,))
+        return violation
+    
+    def remove(self, violation):
+        self.pop(self.index(violation))
+    
+    def clear(self):
+        super().clear()
+        self._recount()
+    
+    def __setitem__(self, index, value):
+        # Counts change only after the assignment succeeds (an extended slice
+        # of the wrong length raises and leaves the list untouched)
+        if isinstance(index, slice):
+            value = list(value)
+            replaced = self[index]
+            super().__setitem__(index, value)
+            self._discard(replaced)
+            self._add(value)
+        else:
+            replaced = self[index]
+            super().__setitem__(index, value)
+            self._discard((replaced,))
+            self._add((value,))
+    
+    def __delitem__(self, index):
+        removed = self[index]
+        super().__delitem__(index)
+        self._discard(removed if isinstance(index, slice) else (removed,))
+    
+    def __imul__(self, n):
+        super().__imul__(n)
+        self._recount()
+        return self
+
+
 class ComplianceValidator:
     """
     SECURITY: Compliance validation for multiple standards
@@ -44,9 +228,27 @@ class ComplianceValidator:
     """
     
     def __init__(self):
-        self.violations: List[ComplianceViolation] = []
+        self.violations = []
     
-    def validate_zatca_invoice(self, invoice: Dict[str, Any]) -> List[ComplianceViolation]:
+    @property
+    def violations(self) -> List[ComplianceViolation]:
+        """Recorded violations; counted as they are added or removed"""
+        return self._violations
+    
+    @violations.setter
+    def violations(self, violations: List[ComplianceViolation]):
+        # A counted list is kept as is: `validator.violations += new` extends the
+        # live list in place and assigns it back, so nothing is recounted.
+        # Any other list is counted once
+        if not isinstance(violations, _ViolationList):
+            violations = _ViolationList(violations)
+        self._violations = violations
+    
+    def validate_zatca_invoice(
+        self,
+        invoice: Dict[str, Any],
+        fail_fast: bool = False
+    ) -> List[ComplianceViolation]:
         """
         ZATCA: Validate invoice meets ZATCA Phase 2 requirements
         
@@ -59,75 +261,170 @@ class ComplianceValidator:
         - QR code
         - Cryptographic hash
         
+        Results are memoized by the invoice's canonical JSON, so re-validating an
+        identical payload (retries, re-submissions, reviews) skips the checks.
+        
         Args:
             invoice: Invoice data dictionary
+            fail_fast: Stop at the first violation found
         
         Returns:
             List of compliance violations (empty if compliant)
         """
-        violations = []
-        
-        # Check required fields
-        required_fields = [
-            'invoice_number',
-            'issue_date',
-            'issue_time',
-            'supplier_vat_number',
-            'customer_name',
-            'line_items',
-            'total_excluding_vat',
-            'vat_amount',
-            'total_including_vat'
+        key = _zatca_cache_key(invoice)
+        if key is None:
+            # Not JSON-serializable; validate without caching
+            return _collect(self._iter_zatca_violations(invoice), fail_fast)
+        
+        with _zatca_cache_lock:
+            cached = _zatca_cache.get(key)
+            if cached is not None:
+                _zatca_cache.move_to_end(key)
+        
+        if cached is None:
+            cached = tuple(
+                (v.severity, v.message, v.field, v.details)
+                for v in self._iter_zatca_violations(invoice)
+            )
+            with _zatca_cache_lock:
+                _zatca_cache[key] = cached
+                if len(_zatca_cache) > ZATCA_CACHE_SIZE:
+                    _zatca_cache.popitem(last=False)
+        
+        if fail_fast:
+            cached = cached[:1]
+        # Fresh violation objects per call; callers may mutate them
+        return [
+            ComplianceViolation(
+                standard=ComplianceStandard.ZATCA,
+                severity=severity,
+                message=message,
+                field=field,
+                details=dict(details)
+            )
+            for severity, message, field, details in cached
         ]
+    
+    def is_zatca_compliant(self, invoice: Dict[str, Any]) -> bool:
+        """ZATCA: Pass/fail check that stops at the first violation"""
+        return next(self._iter_zatca_violations(invoice), None) is None
+    
+    def validate_batch(
+        self,
+        invoices: List[Dict[str, Any]],
+        workers: Optional[int] = None
+    ) -> List[List[ComplianceViolation]]:
+        """
+        ZATCA: Full violation lists for a large batch, spread over worker processes
+        
+        Invoices are independent, so the batch is split into chunks validated in
+        parallel. Results are returned in input order and are not added to
+        self.violations; callers aggregate them.
+        
+        Args:
+            invoices: Invoices to validate
+            workers: Worker processes (default: CPU count)
+        
+        Returns:
+            One list of violations per invoice
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(invoices) < ZATCA_PARALLEL_MIN_BATCH:
+            return [self.validate_zatca_invoice(invoice) for invoice in invoices]
+        
+        chunksize = max(1, len(invoices) // (8 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_validate_zatca_in_worker, invoices, chunksize=chunksize))
+    
+    def validate_zatca_invoices_bulk(self, invoices: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        ZATCA: Pass/fail validation for a batch of invoices (e.g. month-end filing)
         
-        for field in required_fields:
+        The VAT recalculation runs vectorized over the whole batch; the remaining
+        per-invoice checks only run for invoices whose VAT is correct.
+        Call validate_zatca_invoice on failed entries to get the violations.
+        
+        Returns:
+            Boolean array, True where the invoice is compliant
+        """
+        totals = np.fromiter(
+            (_vat_total(invoice, 'total_excluding_vat') for invoice in invoices),
+            dtype=np.float64, count=len(invoices)
+        )
+        vats = np.fromiter(
+            (_vat_total(invoice, 'vat_amount') for invoice in invoices),
+            dtype=np.float64, count=len(invoices)
+        )
+        # NaN marks invoices without the full set of totals; the check does not apply.
+        # Same rule as the per-invoice check, with round() reproduced exactly
+        vat_ok = np.isnan(totals) | np.isnan(vats) | (
+            np.abs(_round_cents(totals * 0.15) - _round_cents(vats)) <= 0.01
+        )
+        
+        compliant = vat_ok.copy()
+        for idx in np.flatnonzero(vat_ok):
+            violations = self._iter_zatca_violations(invoices[idx], check_vat=False)
+            compliant[idx] = next(violations, None) is None
+        return compliant
+    
+    def _iter_zatca_violations(
+        self,
+        invoice: Dict[str, Any],
+        check_vat: bool = True
+    ) -> Iterator[ComplianceViolation]:
+        """Yield ZATCA violations lazily, cheapest checks first"""
+        # Check required fields
+        for field in ZATCA_REQUIRED_FIELDS:
             if field not in invoice or invoice[field] is None:
-                violations.append(ComplianceViolation(
+                yield ComplianceViolation(
                     standard=ComplianceStandard.ZATCA,
                     severity='critical',
                     message=f'Required field missing: {field}',
                     field=field
-                ))
+                )
         
         # Validate VAT number format (Saudi: 15 digits, starts with 3, ends with 03)
         if 'supplier_vat_number' in invoice:
             vat_number = str(invoice['supplier_vat_number'])
-            if not re.match(r'^3\d{12}03$', vat_number):
-                violations.append(ComplianceViolation(
+            if not _is_saudi_vat_number(vat_number):
+                yield ComplianceViolation(
                     standard=ComplianceStandard.ZATCA,
                     severity='critical',
                     message='Invalid Saudi VAT number format. Must be 15 digits starting with 3 and ending with 03',
                     field='supplier_vat_number'
-                ))
+                )
         
         # Validate VAT calculation (15%)
-        if all(k in invoice for k in ['total_excluding_vat', 'vat_amount', 'total_including_vat']):
+        if check_vat and all(k in invoice for k in ZATCA_VAT_FIELDS):
             expected_vat = round(invoice['total_excluding_vat'] * 0.15, 2)
             actual_vat = round(invoice['vat_amount'], 2)
             
             if abs(expected_vat - actual_vat) > 0.01:  # Allow 1 cent tolerance
-                violations.append(ComplianceViolation(
+                yield ComplianceViolation(
                     standard=ComplianceStandard.ZATCA,
                     severity='high',
                     message=f'VAT calculation incorrect. Expected {expected_vat}, got {actual_vat}',
                     field='vat_amount',
                     details={'expected': expected_vat, 'actual': actual_vat}
-                ))
+                )
         
         # Validate line items
         if 'line_items' in invoice and invoice['line_items']:
             for idx, item in enumerate(invoice['line_items']):
                 if 'description' not in item or not item['description']:
-                    violations.append(ComplianceViolation(
+                    yield ComplianceViolation(
                         standard=ComplianceStandard.ZATCA,
                         severity='medium',
                         message=f'Line item {idx + 1} missing description',
                         field=f'line_items[{idx}].description'
-                    ))
-        
-        return violations
+                    )
     
-    def validate_pdpl_data(self, data: Dict[str, Any], data_type: str) -> List[ComplianceViolation]:
+    def validate_pdpl_data(
+        self,
+        data: Dict[str, Any],
+        data_type: str,
+        fail_fast: bool = False
+    ) -> List[ComplianceViolation]:
         """
         PDPL: Validate data meets Saudi Personal Data Protection Law requirements
         
@@ -140,46 +437,47 @@ class ComplianceValidator:
         Args:
             data: Data dictionary
             data_type: Type of data (e.g., 'customer', 'employee', 'outlet')
+            fail_fast: Stop at the first violation found
         
         Returns:
             List of compliance violations
         """
-        violations = []
-        
-        # Check for PII fields that should be encrypted
-        pii_fields = [
-            'national_id',
-            'iqama_id',
-            'passport_number',
-            'phone',
-            'email',
-            'address',
-            'birth_date'
-        ]
-        
-        for field in pii_fields:
-            if field in data and data[field]:
+        return _collect(self._iter_pdpl_violations(data, data_type), fail_fast)
+    
+    def is_pdpl_compliant(self, data: Dict[str, Any], data_type: str) -> bool:
+        """PDPL: Pass/fail check that stops at the first violation"""
+        return next(self._iter_pdpl_violations(data, data_type), None) is None
+    
+    def _iter_pdpl_violations(
+        self,
+        data: Dict[str, Any],
+        data_type: str
+    ) -> Iterator[ComplianceViolation]:
+        """Yield PDPL violations lazily"""
+        # Check for PII fields that should be encrypted; only fields present in
+        # the record are visited, in declaration order so results are stable
+        present = _PDPL_PII_FIELD_SET.intersection(data)
+        for field in (f for f in PDPL_PII_FIELDS if f in present):
+            if data[field]:
                 # Check if data appears to be encrypted (base64-like format)
                 value = str(data[field])
                 if not self._appears_encrypted(value):
-                    violations.append(ComplianceViolation(
+                    yield ComplianceViolation(
                         standard=ComplianceStandard.PDPL,
                         severity='critical',
                         message=f'PII field "{field}" must be encrypted at rest',
                         field=field
-                    ))
+                    )
         
         # Check for consent documentation
-        if data_type in ['customer', 'outlet', 'employee']:
+        if data_type in PDPL_CONSENT_DATA_TYPES:
             if 'consent_date' not in data or not data.get('consent_date'):
-                violations.append(ComplianceViolation(
+                yield ComplianceViolation(
                     standard=ComplianceStandard.PDPL,
                     severity='high',
                     message='Data collection consent not documented',
                     field='consent_date'
-                ))
-        
-        return violations
+                )
     
     def validate_hipaa_phi(self, phi_data: Dict[str, Any]) -> List[ComplianceViolation]:
         """
@@ -199,18 +497,11 @@ class ComplianceValidator:
         """
         violations = []
         
-        # Check for PHI fields that must be encrypted
-        phi_fields = [
-            'patient_id',
-            'medical_record_number',
-            'diagnosis',
-            'treatment',
-            'prescription',
-            'lab_results'
-        ]
-        
-        for field in phi_fields:
-            if field in phi_data and phi_data[field]:
+        # Check for PHI fields that must be encrypted; as for PDPL, only fields
+        # present in the record are visited, in declaration order
+        present = _HIPAA_PHI_FIELD_SET.intersection(phi_data)
+        for field in (f for f in HIPAA_PHI_FIELDS if f in present):
+            if phi_data[field]:
                 value = str(phi_data[field])
                 if not self._appears_encrypted(value):
                     violations.append(ComplianceViolation(
@@ -241,16 +532,7 @@ class ComplianceValidator:
         violations = []
         
         # Check for required NPHIES identifiers
-        required_fields = [
-            'claim_id',
-            'patient_id',
-            'provider_id',
-            'service_date',
-            'diagnosis_code',
-            'service_code'
-        ]
-        
-        for field in required_fields:
+        for field in NPHIES_REQUIRED_FIELDS:
             if field not in claim or not claim[field]:
                 violations.append(ComplianceViolation(
                     standard=ComplianceStandard.NPHIES,
@@ -262,7 +544,7 @@ class ComplianceValidator:
         # Validate OID namespace (BrainSAIT: 1.3.6.1.4.1.61026)
         if 'patient_id' in claim:
             patient_id = str(claim['patient_id'])
-            if not patient_id.startswith('urn:oid:1.3.6.1.4.1.61026'):
+            if not patient_id.startswith(BRAINSAIT_OID_PREFIX):
                 violations.append(ComplianceViolation(
                     standard=ComplianceStandard.NPHIES,
                     severity='high',
@@ -282,8 +564,7 @@ class ComplianceValidator:
             return False
         
         # Check for base64-like characters
-        base64_pattern = re.compile(r'^[A-Za-z0-9+/=_-]+$')
-        return bool(base64_pattern.match(value))
+        return not value.encode().translate(None, _BASE64_ALPHABET)
     
     def validate_all(
         self,
@@ -321,30 +602,79 @@ class ComplianceValidator:
         Returns:
             Compliance report with violation summary
         """
-        violations_by_standard = {}
-        violations_by_severity = {'critical': 0, 'high': 0, 'medium': 0, 'low': 0}
-        
-        for violation in self.violations:
-            # Group by standard
-            if violation.standard not in violations_by_standard:
-                violations_by_standard[violation.standard] = []
-            violations_by_standard[violation.standard].append(violation)
-            
-            # Count by severity
-            violations_by_severity[violation.severity] += 1
+        violations = self._violations
+        # Counts are maintained by _ViolationList; unary + drops emptied buckets
+        by_severity = dict.fromkeys(VIOLATION_SEVERITIES, 0)
+        by_severity.update(+violations.by_severity)
         
         return {
-            'total_violations': len(self.violations),
-            'by_standard': {
-                standard: len(viols) 
-                for standard, viols in violations_by_standard.items()
-            },
-            'by_severity': violations_by_severity,
-            'is_compliant': len(self.violations) == 0,
-            'critical_violations': violations_by_severity['critical']
+            'total_violations': len(violations),
+            'by_standard': dict(+violations.by_standard),
+            'by_severity': by_severity,
+            'is_compliant': len(violations) == 0,
+            'critical_violations': by_severity['critical']
         }
 
 
+# LRU of ZATCA results: cache key -> (severity, message, field, details) per violation
+_zatca_cache: "OrderedDict[bytes, Tuple[tuple, ...]]" = OrderedDict()
+_zatca_cache_lock = threading.Lock()
+
+
+def _zatca_cache_key(invoice: Dict[str, Any]) -> Optional[bytes]:
+    """Digest of the invoice's canonical JSON, or None if it cannot be serialized"""
+    try:
+        canonical = json.dumps(invoice, sort_keys=True, separators=(',', ':'))
+    except (TypeError, ValueError):
+        return None
+    digest = hashlib.blake2b(canonical.encode(), digest_size=16)
+    digest.update(ZATCA_RULES_VERSION.to_bytes(4, 'little'))
+    return digest.digest()
+
+
+def _vat_total(invoice: Dict[str, Any], field: str) -> float:
+    """Numeric total for the bulk VAT check, NaN when the check does not apply"""
+    if any(invoice.get(k) is None for k in ZATCA_VAT_FIELDS):
+        return np.nan
+    value = invoice[field]
+    if not isinstance(value, numbers.Real):
+        # The per-invoice check cannot do arithmetic on these either
+        raise TypeError(f"ZATCA: {field} must be a number, got {type(value).__name__}")
+    return float(value)
+
+
+def _round_cents(values: np.ndarray) -> np.ndarray:
+    """round(value, 2) for each element, matching Python's correctly rounded result"""
+    scaled = values * 100
+    rounded = np.rint(scaled) / 100
+    # values * 100 is itself rounded, so near a half cent it may land on the
+    # wrong side; those few elements go through round()
+    with np.errstate(invalid='ignore'):
+        near_half = np.abs(scaled - np.floor(scaled) - 0.5) <= 4 * np.spacing(np.abs(scaled))
+    for idx in np.flatnonzero(near_half):
+        rounded[idx] = round(float(values[idx]), 2)
+    return rounded
+
+
+def _collect(
+    violations: Iterator[ComplianceViolation],
+    fail_fast: bool
+) -> List[ComplianceViolation]:
+    """Materialize a violation generator, keeping only the first if fail_fast"""
+    return list(islice(violations, 1)) if fail_fast else list(violations)
+
+
+# Per-process validator for validate_batch workers; each worker keeps its own ZATCA cache
+_worker_validator: Optional["ComplianceValidator"] = None
+
+
+def _validate_zatca_in_worker(invoice: Dict[str, Any]) -> List[ComplianceViolation]:
+    global _worker_validator
+    if _worker_validator is None:
+        _worker_validator = ComplianceValidator()
+    return _worker_validator.validate_zatca_invoice(invoice)
+
+
 def get_compliance_validator() -> ComplianceValidator:
     """Get a new compliance validator instance"""
     return ComplianceValidator()
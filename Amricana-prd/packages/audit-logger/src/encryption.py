@@ -4,11 +4,50 @@
 
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.backends import default_backend
-from typing import Optional, Union
+from functools import lru_cache
+from typing import List, Optional, Union
 import base64
 import os
+import time
+
+
+# Use a fixed salt for key derivation (in production, store this securely)
+_KDF_SALT = b'ssdp_brainsait_salt_v1'
+
+# Supported key derivation functions:
+#   pbkdf2 - 100k iterations, for password-like master keys (default)
+#   hkdf   - single extract/expand, for high-entropy keys (e.g. issued by a KMS)
+# The two produce different keys, so data must be decrypted with the KDF it was encrypted with
+KDF_ALGORITHMS = ("pbkdf2", "hkdf")
+
+
+@lru_cache(maxsize=8)
+def _derive_key(master_key: str, salt: bytes, kdf: str) -> bytes:
+    """
+    SECURITY: Derive the Fernet key from the master key
+    Cached per process so new EncryptionService instances skip the KDF
+    """
+    if kdf == "hkdf":
+        derivation = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=salt,
+            info=b'ssdp_field_encryption',
+            backend=default_backend()
+        )
+    else:
+        derivation = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=salt,
+            iterations=100000,
+            backend=default_backend()
+        )
+    
+    return base64.urlsafe_b64encode(derivation.derive(master_key.encode()))
 
 
 class EncryptionService:
@@ -17,12 +56,13 @@ class EncryptionService:
     Implements AES-256 encryption for PII and financial data
     """
     
-    def __init__(self, master_key: Optional[str] = None):
+    def __init__(self, master_key: Optional[str] = None, kdf: Optional[str] = None):
         """
         Initialize encryption service
         
         Args:
             master_key: Master encryption key. If not provided, will use environment variable
+            kdf: Key derivation function ("pbkdf2" or "hkdf"). Defaults to ENCRYPTION_KDF or "pbkdf2"
         """
         self.master_key = master_key or os.getenv("ENCRYPTION_MASTER_KEY")
         
@@ -32,26 +72,22 @@ class EncryptionService:
                 "Set ENCRYPTION_MASTER_KEY environment variable or pass master_key parameter."
             )
         
+        self.kdf = kdf or os.getenv("ENCRYPTION_KDF", "pbkdf2")
+        
+        if self.kdf not in KDF_ALGORITHMS:
+            raise ValueError(
+                f"SECURITY: Unknown key derivation function '{self.kdf}'. "
+                f"Expected one of: {', '.join(KDF_ALGORITHMS)}"
+            )
+        
         self._fernet = self._initialize_fernet()
     
     def _initialize_fernet(self) -> Fernet:
         """
         SECURITY: Initialize Fernet cipher with derived key
-        Uses PBKDF2 to derive encryption key from master key
+        Derivation runs once per (master key, KDF) per process
         """
-        # Use a fixed salt for key derivation (in production, store this securely)
-        salt = b'ssdp_brainsait_salt_v1'
-        
-        kdf = PBKDF2(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-            backend=default_backend()
-        )
-        
-        key = base64.urlsafe_b64encode(kdf.derive(self.master_key.encode()))
-        return Fernet(key)
+        return Fernet(_derive_key(self.master_key, _KDF_SALT, self.kdf))
     
     def encrypt(self, data: Union[str, bytes]) -> str:
         """
@@ -97,12 +133,31 @@ class EncryptionService:
         """
         encrypted_data = data.copy()
         
-        for field in fields_to_encrypt:
-            if field in encrypted_data and encrypted_data[field] is not None:
-                encrypted_data[field] = self.encrypt(str(encrypted_data[field]))
+        fields = [
+            field for field in fields_to_encrypt
+            if field in encrypted_data and encrypted_data[field] is not None
+        ]
+        values = [str(encrypted_data[field]).encode('utf-8') for field in fields]
+        
+        for field, encrypted in zip(fields, self._encrypt_many(values)):
+            encrypted_data[field] = encrypted
         
         return encrypted_data
     
+    def _encrypt_many(self, values: List[bytes]) -> List[str]:
+        """
+        SECURITY: Encrypt several values under one timestamp
+        Produces the same Fernet tokens as encrypt(), so decrypt() is unchanged
+        """
+        current_time = int(time.time())
+        
+        return [
+            base64.urlsafe_b64encode(
+                self._fernet.encrypt_at_time(value, current_time)
+            ).decode('utf-8')
+            for value in values
+        ]
+    
     def decrypt_dict(self, data: dict, fields_to_decrypt: list) -> dict:
         """
         SECURITY: Decrypt specific fields in a dictionary
@@ -3,7 +3,8 @@
 
 from fastapi import Request, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import Optional, Callable, Dict, Any
+from typing import Optional, Callable, Dict, Any, Tuple
+from array import array
 import time
 from datetime import datetime
 
@@ -11,6 +12,68 @@ from .audit_logger import get_audit_logger, AuditAction, ResourceType, SeverityL
 from .permission_guard import get_permission_guard
 
 
+# Rate limiting: requests allowed per client IP within a sliding window
+RATE_LIMIT_MAX_REQUESTS = 100
+RATE_LIMIT_WINDOW_SECONDS = 60
+# The window is tracked as this many sub-window buckets of request counts
+RATE_LIMIT_BUCKETS = 10
+
+
+# ASGI header names are lowercase bytes; compare against these directly
+_XFF = b"x-forwarded-for"
+_USER_AGENT = b"user-agent"
+
+
+def _client_info(scope: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+    """
+    Client IP and user agent from an ASGI scope, in one pass over the headers
+    X-Forwarded-For (first hop) takes precedence over the socket peer address
+    """
+    forwarded_for = user_agent = None
+    for name, value in scope.get("headers", ()):
+        # Repeated headers: the first occurrence wins, as with Starlette's headers.get
+        if name == _XFF:
+            if forwarded_for is None:
+                forwarded_for = value
+        elif name == _USER_AGENT:
+            if user_agent is None:
+                user_agent = value
+    
+    if forwarded_for:
+        client_ip = forwarded_for.split(b",", 1)[0].strip().decode("latin-1")
+    elif scope.get("client"):
+        client_ip = scope["client"][0]
+    else:
+        client_ip = "unknown"
+    
+    return client_ip, user_agent.decode("latin-1") if user_agent is not None else None
+
+
+class _RateWindow:
+    """
+    Sliding-window request counter for one client
+    Ring of per-bucket counts; constant memory regardless of request volume
+    """
+    
+    __slots__ = ("slot", "counts")
+    
+    def __init__(self, slot: int, buckets: int):
+        self.slot = slot  # absolute bucket number of the most recent bucket
+        self.counts = array("H", bytes(2 * buckets))
+    
+    def advance(self, slot: int) -> int:
+        """Move the window to end at slot, zeroing expired buckets; return the total count"""
+        buckets = len(self.counts)
+        elapsed = slot - self.slot
+        if elapsed >= buckets:
+            self.counts = array("H", bytes(2 * buckets))
+        else:
+            for expired in range(self.slot + 1, slot + 1):
+                self.counts[expired % buckets] = 0
+        self.slot = slot
+        return sum(self.counts)
+
+
 class SecurityMiddleware:
     """
     SECURITY: Security middleware for FastAPI applications
@@ -21,7 +84,8 @@ class SecurityMiddleware:
         self.app = app
         self.audit_logger = get_audit_logger()
         self.permission_guard = get_permission_guard()
-        self.request_counts: Dict[str, list] = {}  # IP -> [timestamp, ...]
+        self.request_counts: Dict[str, _RateWindow] = {}  # IP -> request counter
+        self._bucket_seconds = RATE_LIMIT_WINDOW_SECONDS / RATE_LIMIT_BUCKETS
     
     async def __call__(self, scope, receive, send):
         """
@@ -32,12 +96,11 @@ class SecurityMiddleware:
             await self.app(scope, receive, send)
             return
         
-        request = Request(scope, receive)
-        
-        # Extract request info
-        client_ip = self._get_client_ip(request)
-        path = request.url.path
-        method = request.method
+        # Read request info straight from the ASGI scope; no Request object is
+        # needed since the middleware never touches the body
+        client_ip = self._get_client_ip(scope)
+        path = scope["path"]
+        method = scope["method"]
         
         # Rate limiting check
         if self._is_rate_limited(client_ip):
@@ -74,51 +137,49 @@ class SecurityMiddleware:
         # Continue with normal request processing
         await self.app(scope, receive, send)
     
-    def _get_client_ip(self, request: Request) -> str:
-        """Extract client IP address from request"""
-        # Check X-Forwarded-For header first (for proxies)
-        forwarded_for = request.headers.get("x-forwarded-for")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-        
-        # Fall back to direct client IP
-        if request.client:
-            return request.client.host
-        
-        return "unknown"
+    def _get_client_ip(self, scope: Dict[str, Any]) -> str:
+        """Extract client IP address from the ASGI scope"""
+        return _client_info(scope)[0]
     
-    def _is_rate_limited(self, ip: str, max_requests: int = 100, window_seconds: int = 60) -> bool:
+    def _is_rate_limited(self, ip: str, max_requests: int = RATE_LIMIT_MAX_REQUESTS) -> bool:
         """
         SECURITY: Check if IP is rate limited
+        Counts requests over the last RATE_LIMIT_WINDOW_SECONDS, at bucket granularity
         
         Args:
             ip: Client IP address
             max_requests: Maximum requests allowed in window
-            window_seconds: Time window in seconds
         
         Returns:
             True if rate limited, False otherwise
         """
-        current_time = time.time()
-        
-        if ip not in self.request_counts:
+        window = self.request_counts.get(ip)
+        if window is None:
             return False
         
-        # Remove old requests outside the window
-        self.request_counts[ip] = [
-            ts for ts in self.request_counts[ip]
-            if current_time - ts < window_seconds
-        ]
+        total = window.advance(self._current_slot())
+        if not total:
+            # Forget idle clients so the table does not grow without bound
+            del self.request_counts[ip]
+            return False
         
         # Check if over limit
-        return len(self.request_counts[ip]) >= max_requests
+        return total >= max_requests
     
     def _track_request(self, ip: str):
-        """Track request timestamp for rate limiting"""
-        if ip not in self.request_counts:
-            self.request_counts[ip] = []
+        """Track request for rate limiting"""
+        slot = self._current_slot()
+        window = self.request_counts.get(ip)
+        if window is None:
+            window = self.request_counts[ip] = _RateWindow(slot, RATE_LIMIT_BUCKETS)
+        else:
+            window.advance(slot)
         
-        self.request_counts[ip].append(time.time())
+        window.counts[slot % RATE_LIMIT_BUCKETS] += 1
+    
+    def _current_slot(self) -> int:
+        """Absolute bucket number for the current monotonic time"""
+        return int(time.monotonic() // self._bucket_seconds)
 
 
 class SecureEndpoint:
@@ -162,48 +223,45 @@ class SecureEndpoint:
             user_id = self._extract_user_id(credentials)
             user_role = self._extract_user_role(credentials)
             
-            # Get client IP
-            client_ip = request.headers.get("x-forwarded-for", request.client.host if request.client else "unknown")
+            # Get client IP and user agent in one pass over the raw headers
+            client_ip, user_agent = _client_info(request.scope)
+            scope_path = request.scope["path"]
             
             # Check permission if required
+            granted = True
             if self.required_permission and user_role:
-                has_permission = self.permission_guard.has_permission(user_role, self.required_permission)
-                
-                if not has_permission:
-                    # Log unauthorized access attempt
-                    self.audit_logger.log_security_event(
-                        user_id=user_id,
-                        event_type="unauthorized_access",
-                        details={
-                            "required_permission": self.required_permission,
-                            "user_role": user_role,
-                            "endpoint": str(request.url.path),
-                            "method": request.method
-                        },
-                        severity=SeverityLevel.WARNING
-                    )
-                    
-                    raise HTTPException(
-                        status_code=status.HTTP_403_FORBIDDEN,
-                        detail="Insufficient permissions"
-                    )
+                granted = self.permission_guard.has_permission(user_role, self.required_permission)
             
-            # Log the access
+            # One audit entry per request, carrying the permission outcome
             resource_id = kwargs.get('id') or kwargs.get('resource_id') or 'unknown'
+            details = {
+                "endpoint": scope_path,
+                "method": request.scope["method"],
+                "user_role": user_role
+            }
+            if self.required_permission:
+                details["required_permission"] = self.required_permission
+                details["permission_check"] = "granted" if granted else "denied"
+            if not granted:
+                details["event_type"] = "unauthorized_access"
             
             self.audit_logger.log(
                 user_id=user_id,
-                action=self.audit_action,
+                action=self.audit_action if granted else AuditAction.ACCESS_DENIED,
                 resource_type=self.resource_type,
                 resource_id=str(resource_id),
-                details={
-                    "endpoint": str(request.url.path),
-                    "method": request.method,
-                    "user_role": user_role
-                },
-                ip_address=client_ip
+                details=details,
+                ip_address=client_ip,
+                user_agent=user_agent,
+                severity=SeverityLevel.INFO if granted else SeverityLevel.WARNING
             )
             
+            if not granted:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Insufficient permissions"
+                )
+            
             # Execute the endpoint function
             return await func(*args, **kwargs)
         
@@ -1,7 +1,10 @@
 # BRAINSAIT: Permission guard for RBAC enforcement
 # SECURITY: Role-based access control with audit logging
 
-from typing import Dict, List, Optional
+import sys
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
 
 try:
     from .audit_logger import (
@@ -22,6 +25,27 @@ except ImportError:
     )
 
 
+# Upper bound on memoized decisions outside the precomputed universe, per guard
+DECISION_CACHE_SIZE = 4096
+
+# Actions that form the "action:resource_type" permission universe
+PERMISSION_ACTIONS = ("create", "read", "update", "delete", "approve", "reject", "export")
+
+# Roles that may access resources owned by anyone
+_ALL_RESOURCES_ROLES = frozenset({"super_admin", "regional_manager"})
+
+# Audit action recorded for each granted permission action
+_AUDIT_ACTIONS: Dict[str, AuditAction] = {
+    "create": AuditAction.CREATE,
+    "read": AuditAction.READ,
+    "update": AuditAction.UPDATE,
+    "delete": AuditAction.DELETE,
+    "approve": AuditAction.APPROVE,
+    "reject": AuditAction.REJECT,
+    "export": AuditAction.EXPORT
+}
+
+
 class PermissionGuard:
     """
     SECURITY: Role-based access control guard
@@ -31,6 +55,107 @@ class PermissionGuard:
     def __init__(self, audit_logger: Optional[AuditLogger] = None):
         self.audit_logger = audit_logger or get_audit_logger()
         self.permissions = self._initialize_permissions()
+        self._compile_permissions()
+    
+    def _compile_permissions(self):
+        """
+        Build hashed lookup structures from self.permissions
+        Call again after changing self.permissions
+        """
+        # Interned role and permission names: lookups with literal or
+        # previously seen keys match by identity before comparing characters
+        self.permissions = {
+            sys.intern(role): [sys.intern(p) for p in perms]
+            for role, perms in self.permissions.items()
+        }
+        # Exact permissions per role
+        self._permission_sets: Dict[str, FrozenSet[str]] = {
+            role: frozenset(perms) for role, perms in self.permissions.items()
+        }
+        # Actions granted on every resource ("read:*" -> "read") per role
+        self._wildcard_actions: Dict[str, FrozenSet[str]] = {
+            role: frozenset(p[:-2] for p in perms if p.endswith(":*"))
+            for role, perms in self.permissions.items()
+        }
+        # Roles holding "*" (all permissions)
+        self._super_roles: FrozenSet[str] = frozenset(
+            role for role, perms in self._permission_sets.items() if "*" in perms
+        )
+        # Integer ids for roles and for every action:resource_type permission,
+        # and one bitmask per role (bit n set = permission id n granted)
+        self.role_ids: Dict[str, int] = {role: i for i, role in enumerate(self.permissions)}
+        # Interned "action:resource_type" names, so check_access neither formats
+        # a string nor reads Enum.value per call
+        self._permission_names: Dict[Tuple[str, ResourceType], str] = {
+            (action, resource_type): sys.intern(f"{action}:{resource_type.value}")
+            for action in PERMISSION_ACTIONS
+            for resource_type in ResourceType
+        }
+        universe = list(self._permission_names.values())
+        self.permission_ids: Dict[str, int] = {p: i for i, p in enumerate(universe)}
+        self._role_masks: List[int] = [
+            sum(
+                1 << perm_id
+                for permission, perm_id in self.permission_ids.items()
+                if self._resolve_permission(role, permission)
+            )
+            for role in self.role_ids
+        ]
+        # The same grants as a role x permission boolean matrix for bulk checks
+        self._grant_matrix = np.array(
+            [
+                [self._resolve_permission(role, permission) for permission in universe]
+                for role in self.role_ids
+            ],
+            dtype=bool
+        ).reshape(len(self.role_ids), len(universe))
+        
+        # Every decision over the known universe (plus any permission a role
+        # lists explicitly), precomputed so has_permission is one dict lookup
+        known_permissions = set(universe).union(*self._permission_sets.values())
+        self._static_decisions: Dict[Tuple[str, str], bool] = {
+            (role, permission): self._resolve_permission(role, permission)
+            for role in self.role_ids
+            for permission in known_permissions
+        }
+        # Static decisions plus memoized results for permissions outside the universe
+        self._decisions: Dict[Tuple[str, str], bool] = dict(self._static_decisions)
+    
+    def set_role_permissions(self, user_role: str, permissions: List[str]):
+        """
+        SECURITY: Grant a role exactly these permissions (adds the role if new)
+        Recompiles the lookup structures, so no cached decision outlives the change
+        """
+        self.permissions[user_role] = list(permissions)
+        self._compile_permissions()
+    
+    def has_permission_id(self, role_id: int, permission_id: int) -> bool:
+        """
+        SECURITY: Permission check on pre-resolved ids (see role_ids, permission_ids)
+        For gateways that translate the role and permission once per route or
+        session; each check is then a single bit test. Ids outside the compiled
+        tables are denied (a negative index must not wrap to another role)
+        """
+        if not (0 <= role_id < len(self._role_masks)
+                and 0 <= permission_id < len(self.permission_ids)):
+            return False
+        return bool(self._role_masks[role_id] >> permission_id & 1)
+    
+    def has_permissions_bulk(self, role_id: int, permission_ids: np.ndarray) -> np.ndarray:
+        """
+        SECURITY: Permission checks for many pre-resolved permission ids at once
+        One gather from the compiled grant matrix; returns a boolean array
+        aligned with permission_ids. Out-of-range ids are denied, as in
+        has_permission_id
+        """
+        permission_ids = np.asarray(permission_ids)
+        n_roles, n_permissions = self._grant_matrix.shape
+        if not 0 <= role_id < n_roles:
+            return np.zeros(permission_ids.shape, dtype=bool)
+        in_range = (permission_ids >= 0) & (permission_ids < n_permissions)
+        if in_range.all():
+            return self._grant_matrix[role_id, permission_ids]
+        return self._grant_matrix[role_id, np.where(in_range, permission_ids, 0)] & in_range
     
     def _initialize_permissions(self) -> Dict[str, List[str]]:
         """
@@ -115,13 +240,24 @@ class PermissionGuard:
         Returns:
             True if user has permission, False otherwise
         """
-        if user_role not in self.permissions:
+        key = (user_role, permission)
+        decision = self._decisions.get(key)
+        if decision is None:
+            decision = self._resolve_permission(user_role, permission)
+            if len(self._decisions) >= len(self._static_decisions) + DECISION_CACHE_SIZE:
+                # Unbounded caller input must not grow the cache without limit
+                self._decisions = dict(self._static_decisions)
+            self._decisions[key] = decision
+        return decision
+    
+    def _resolve_permission(self, user_role: str, permission: str) -> bool:
+        """Evaluate a permission against the compiled role structures"""
+        role_permissions = self._permission_sets.get(user_role)
+        if role_permissions is None:
             return False
         
-        role_permissions = self.permissions[user_role]
-        
         # Super admin has all permissions
-        if "*" in role_permissions:
+        if user_role in self._super_roles:
             return True
         
         # Check exact permission match
@@ -129,10 +265,10 @@ class PermissionGuard:
             return True
         
         # Check wildcard permissions (e.g., "read:*" allows all read operations)
-        action, resource = permission.split(":", 1) if ":" in permission else (permission, "*")
-        wildcard_permission = f"{action}:*"
-        
-        return wildcard_permission in role_permissions
+        wildcard_actions = self._wildcard_actions[user_role]
+        if not wildcard_actions:
+            return False
+        return permission.partition(":")[0] in wildcard_actions
     
     def check_access(
         self,
@@ -157,7 +293,10 @@ class PermissionGuard:
         Returns:
             True if access is granted, False otherwise
         """
-        permission = f"{action}:{resource_type.value}"
+        permission = (
+            self._permission_names.get((action, resource_type))
+            or f"{action}:{resource_type.value}"
+        )
         has_access = self.has_permission(user_role, permission)
         
         # Log access attempt
@@ -184,17 +323,7 @@ class PermissionGuard:
         if not access_granted:
             return AuditAction.ACCESS_DENIED
         
-        action_map = {
-            "create": AuditAction.CREATE,
-            "read": AuditAction.READ,
-            "update": AuditAction.UPDATE,
-            "delete": AuditAction.DELETE,
-            "approve": AuditAction.APPROVE,
-            "reject": AuditAction.REJECT,
-            "export": AuditAction.EXPORT
-        }
-        
-        return action_map.get(action, AuditAction.READ)
+        return _AUDIT_ACTIONS.get(action, AuditAction.READ)
     
     def check_resource_ownership(
         self,
@@ -215,7 +344,7 @@ class PermissionGuard:
             True if user owns resource or has admin access
         """
         # Super admins and regional managers can access all resources
-        if user_role in ["super_admin", "regional_manager"]:
+        if user_role in _ALL_RESOURCES_ROLES:
             return True
         
         # Outlet owners can only access their own resources
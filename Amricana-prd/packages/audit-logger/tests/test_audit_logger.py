@@ -5,6 +5,10 @@ import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
+import io
+import json
+import threading
+import time
 import pytest
 from datetime import datetime, timedelta
 from audit_logger import (
@@ -12,7 +16,8 @@ from audit_logger import (
     AuditLog,
     AuditAction,
     ResourceType,
-    SeverityLevel
+    SeverityLevel,
+    _resolve_hasher
 )
 
 
@@ -41,6 +46,42 @@ class TestAuditLog:
         assert log.id is not None
         assert log.checksum is not None
     
+    def test_audit_log_ids_are_unique(self):
+        """Test that each audit log gets a distinct id"""
+        ids = {
+            AuditLog(
+                user_id="user123",
+                action=AuditAction.READ,
+                resource_type=ResourceType.OUTLET,
+                resource_id="OUT001"
+            ).id
+            for _ in range(1000)
+        }
+        
+        assert len(ids) == 1000
+    
+    def test_audit_log_enum_values(self):
+        """Test that plain value strings resolve and unknown values are rejected"""
+        log = AuditLog(
+            user_id="user123",
+            action="read",
+            resource_type="outlet",
+            resource_id="OUT001",
+            severity="warning"
+        )
+        
+        assert log.action is AuditAction.READ
+        assert log.resource_type is ResourceType.OUTLET
+        assert log.severity is SeverityLevel.WARNING
+        assert log.verify_integrity() is True
+        
+        with pytest.raises(ValueError, match="action"):
+            AuditLog("user123", "teleport", ResourceType.OUTLET, "OUT001")
+        with pytest.raises(ValueError, match="resource_type"):
+            AuditLog("user123", AuditAction.READ, "spaceship", "OUT001")
+        with pytest.raises(ValueError, match="severity"):
+            AuditLog("user123", AuditAction.READ, ResourceType.OUTLET, "OUT001", severity="loud")
+    
     def test_audit_log_integrity(self):
         """Test that audit log checksum verification works"""
         log = AuditLog(
@@ -59,6 +100,59 @@ class TestAuditLog:
         # Should fail verification
         assert log.verify_integrity() is False
     
+    def test_checksum_covers_field_boundaries_and_severity(self):
+        """Test that shifting bytes between fields or changing severity breaks the checksum"""
+        log = AuditLog(
+            user_id="user1",
+            action=AuditAction.READ,
+            resource_type=ResourceType.ORDER,
+            resource_id="23"
+        )
+        
+        log.user_id, log.resource_id = "user12", "3"
+        assert log.verify_integrity() is False
+        
+        log.user_id, log.resource_id = "user1", "23"
+        assert log.verify_integrity() is True
+        
+        log.severity = SeverityLevel.CRITICAL
+        assert log.verify_integrity() is False
+    
+    def test_keyed_checksum_hashers(self):
+        """Test that keyed hashers are MACs and the copied template matches a fresh one"""
+        import hmac
+        import hashlib
+        
+        template = _resolve_hasher("sha256", b"secret")()
+        mac = template.copy()
+        mac.update(b"entry")
+        assert mac.digest() == hmac.new(b"secret", b"entry", hashlib.sha256).digest()
+        
+        for name in ("blake2b", "sha256"):
+            keyed = _resolve_hasher(name, b"secret")()
+            other = _resolve_hasher(name, b"other")()
+            plain = _resolve_hasher(name)()
+            for h in (keyed, other, plain):
+                h.update(b"entry")
+            assert len({keyed.digest(), other.digest(), plain.digest()}) == 3
+    
+    def test_audit_log_timestamp(self):
+        """Test that the nanosecond timestamp round-trips through datetime"""
+        log = AuditLog(
+            user_id="user123",
+            action=AuditAction.READ,
+            resource_type=ResourceType.ORDER,
+            resource_id="ORD001"
+        )
+        
+        assert isinstance(log.timestamp_ns, int)
+        assert log.timestamp.tzinfo is None
+        assert abs(log.timestamp - datetime.utcnow()) < timedelta(seconds=5)
+        
+        log.timestamp = datetime(2024, 1, 15, 10, 30)
+        assert log.timestamp == datetime(2024, 1, 15, 10, 30)
+        assert log.verify_integrity() is False
+    
     def test_audit_log_to_dict(self):
         """Test conversion to dictionary"""
         log = AuditLog(
@@ -75,6 +169,8 @@ class TestAuditLog:
         assert log_dict['resource_type'] == "invoice"
         assert 'timestamp' in log_dict
         assert 'checksum' in log_dict
+        assert len(log.digest) == 32
+        assert log_dict['checksum'] == log.digest.hex()
 
 
 class TestAuditLogger:
@@ -187,6 +283,77 @@ class TestAuditLogger:
         read_logs = logger.get_logs(action=AuditAction.READ)
         assert len(read_logs) == 1
     
+    def test_get_logs_by_action_and_resource_type(self):
+        """Test combined enum filters across a large log store"""
+        logger = AuditLogger()
+        
+        for i in range(1500):
+            logger.log(
+                user_id=f"user{i % 7}",
+                action=AuditAction.READ if i % 2 else AuditAction.UPDATE,
+                resource_type=ResourceType.OUTLET if i % 3 else ResourceType.ORDER,
+                resource_id=f"RES{i}"
+            )
+        
+        logs = logger.get_logs(
+            action=AuditAction.UPDATE,
+            resource_type=ResourceType.ORDER,
+            limit=1000
+        )
+        
+        assert len(logs) == 250
+        assert all(log.action == AuditAction.UPDATE for log in logs)
+        assert all(log.resource_type == ResourceType.ORDER for log in logs)
+        assert logs[0].resource_id == "RES1494"
+    
+    def test_get_logs_by_severity(self):
+        """Test filtering logs by severity"""
+        logger = AuditLogger()
+        
+        logger.log("user1", AuditAction.READ, ResourceType.ORDER, "ORD001")
+        logger.log_security_event("user2", "failed_login")
+        
+        warnings = logger.get_logs(severity=SeverityLevel.WARNING)
+        assert len(warnings) == 1
+        assert warnings[0].user_id == "user2"
+        assert len(logger.get_logs(severity="info")) == 1
+    
+    def test_get_logs_by_resource(self):
+        """Test log retrieval for a specific resource"""
+        logger = AuditLogger()
+        
+        logger.log(
+            user_id="user123",
+            action=AuditAction.READ,
+            resource_type=ResourceType.OUTLET,
+            resource_id="OUT001"
+        )
+        
+        logger.log(
+            user_id="user456",
+            action=AuditAction.UPDATE,
+            resource_type=ResourceType.OUTLET,
+            resource_id="OUT001"
+        )
+        
+        logger.log(
+            user_id="user123",
+            action=AuditAction.READ,
+            resource_type=ResourceType.OUTLET,
+            resource_id="OUT002"
+        )
+        
+        resource_logs = logger.get_logs(resource_type=ResourceType.OUTLET, resource_id="OUT001")
+        assert len(resource_logs) == 2
+        assert resource_logs[0].user_id == "user456"
+        
+        user_resource_logs = logger.get_logs(
+            user_id="user123",
+            resource_type=ResourceType.OUTLET,
+            resource_id="OUT001"
+        )
+        assert len(user_resource_logs) == 1
+    
     def test_get_logs_with_date_range(self):
         """Test log retrieval with date range"""
         logger = AuditLogger()
@@ -205,6 +372,90 @@ class TestAuditLogger:
         
         assert len(logs) == 1
     
+    def test_get_logs_date_window(self):
+        """Test that from_date/to_date select the matching slice, newest first"""
+        logger = AuditLogger()
+        
+        for i in range(10):
+            logger.log("user123", AuditAction.READ, ResourceType.OUTLET, f"OUT{i:03d}")
+            time.sleep(0.001)
+        
+        from_date = logger.logs[3].timestamp
+        to_date = logger.logs[6].timestamp
+        
+        logs = logger.get_logs(from_date=from_date, to_date=to_date)
+        assert [log.resource_id for log in logs] == ["OUT006", "OUT005", "OUT004", "OUT003"]
+        
+        logs = logger.get_logs(user_id="user123", action=AuditAction.READ, from_date=from_date)
+        assert len(logs) == 7
+        assert len(logger.get_logs(action=AuditAction.READ, to_date=to_date)) == 7
+    
+    def test_get_logs_inverted_date_window(self):
+        """Test that from_date after to_date selects nothing instead of failing"""
+        logger = AuditLogger()
+        
+        for i in range(5):
+            logger.log("user123", AuditAction.READ, ResourceType.OUTLET, f"OUT{i:03d}")
+        
+        now = datetime.utcnow()
+        later, earlier = now + timedelta(days=1), now - timedelta(days=1)
+        assert logger.get_logs(from_date=later, to_date=earlier) == []
+        assert logger.get_logs(severity=SeverityLevel.INFO, from_date=later, to_date=earlier) == []
+        assert logger.get_logs(user_id="user123", from_date=later, to_date=earlier) == []
+        assert logger.get_logs(severity=SeverityLevel.INFO, from_date=later) == []
+    
+    def test_get_logs_unknown_filter_values(self):
+        """Test that filtering on a value outside the enums matches nothing"""
+        logger = AuditLogger()
+        logger.log("user123", AuditAction.READ, ResourceType.OUTLET, "OUT001")
+        
+        assert logger.get_logs(action="teleport") == []
+        assert logger.get_logs(action="teleport", severity=SeverityLevel.INFO) == []
+        assert logger.get_logs(resource_type="spaceship", severity=SeverityLevel.INFO) == []
+        assert len(logger.get_logs(action="read", severity="info")) == 1
+    
+    def test_concurrent_logging_keeps_chain(self, tmp_path):
+        """Test that logging from many threads yields one unbroken, ordered chain"""
+        logger = AuditLogger(storage_path=str(tmp_path), fsync_policy="size")
+        
+        def worker(n):
+            for i in range(3000):
+                logger.log(f"user{n}", AuditAction.READ, ResourceType.OUTLET, f"OUT{i:04d}")
+        
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        logger.flush()
+        
+        assert len(logger.logs) == 24000
+        assert logger.verify_range() is True
+        stamps = [log.timestamp_ns for log in logger.logs]
+        assert all(a < b for a, b in zip(stamps, stamps[1:]))
+        # The file holds the entries in chain order
+        persisted = [entry["id"] for entry in logger.read_persisted_logs()]
+        assert persisted == [log.id for log in logger.logs]
+        logger.close()
+    
+    def test_timestamps_increase_when_clock_steps_back(self, monkeypatch):
+        """Test that a wall clock stepping back still yields increasing stamps"""
+        logger = AuditLogger()
+        base = time.time_ns()
+        clock = iter([base, base + 1_000, base - 5_000_000_000, base - 1_000, base + 2_000])
+        monkeypatch.setattr(time, "time_ns", lambda: next(clock))
+        
+        for i in range(5):
+            logger.log("user123", AuditAction.READ, ResourceType.OUTLET, f"OUT{i:03d}")
+        monkeypatch.undo()
+        
+        stamps = [log.timestamp_ns for log in logger.logs]
+        assert stamps == [base, base + 1_000, base + 1_001, base + 1_002, base + 2_000]
+        assert all(log.verify_integrity() for log in logger.logs)
+        # Stamps are microsecond-truncated in datetimes; logs[0] and logs[1] differ by 1us
+        assert len(logger.get_logs(from_date=logger.logs[1].timestamp)) == 4
+        assert len(logger.get_logs(user_id="user123", to_date=logger.logs[0].timestamp)) == 1
+    
     def test_export_logs_json(self):
         """Test log export in JSON format"""
         logger = AuditLogger()
@@ -240,6 +491,65 @@ class TestAuditLogger:
         assert "OUT001" in export
         assert "," in export  # CSV should have commas
     
+    def test_export_logs_csv_quotes_fields(self):
+        """Test that CSV export quotes fields containing commas"""
+        logger = AuditLogger()
+        
+        logger.log(
+            user_id="user123",
+            action=AuditAction.READ,
+            resource_type=ResourceType.OUTLET,
+            resource_id="OUT001,OUT002"
+        )
+        
+        lines = logger.export_logs(format="csv").splitlines()
+        
+        assert lines[0] == "id,timestamp,user_id,action,resource_type,resource_id,severity"
+        assert '"OUT001,OUT002"' in lines[1]
+    
+    def test_iter_export_csv_chunks(self):
+        """Test that chunked CSV export matches the full export"""
+        logger = AuditLogger()
+        
+        for i in range(5):
+            logger.log(
+                user_id="user123",
+                action=AuditAction.READ,
+                resource_type=ResourceType.OUTLET,
+                resource_id=f"OUT{i:03d}"
+            )
+        
+        chunks = list(logger.iter_export_csv(batch=2))
+        
+        assert len(chunks) == 3
+        assert "".join(chunks) == logger.export_logs(format="csv")
+        assert list(AuditLogger().iter_export_csv()) == [
+            "id,timestamp,user_id,action,resource_type,resource_id,severity\n"
+        ]
+    
+    def test_stream_export(self):
+        """Test incremental export to a binary stream"""
+        logger = AuditLogger()
+        
+        for i in range(5):
+            logger.log("user123", AuditAction.READ, ResourceType.OUTLET, f"OUT{i:03d}")
+        
+        buffer = io.BytesIO()
+        assert logger.stream_export(buffer) == 5
+        lines = buffer.getvalue().decode().splitlines()
+        assert json.loads(lines[0])["resource_id"] == "OUT004"
+        
+        buffer = io.BytesIO()
+        logger.stream_export(buffer, format="json")
+        assert len(json.loads(buffer.getvalue())) == 5
+        
+        buffer = io.BytesIO()
+        logger.stream_export(buffer, format="csv")
+        assert buffer.getvalue().decode() == logger.export_logs(format="csv")
+        
+        with pytest.raises(ValueError):
+            logger.stream_export(io.BytesIO(), format="xml")
+    
     def test_verify_log_integrity(self):
         """Test log integrity verification"""
         logger = AuditLogger()
@@ -257,6 +567,196 @@ class TestAuditLogger:
         # Invalid log ID should return False
         assert logger.verify_log_integrity("invalid-id") is False
     
+    def test_verify_range_detects_deleted_log(self):
+        """Test that the hash chain detects a removed entry"""
+        logger = AuditLogger()
+        
+        for i in range(5):
+            logger.log(
+                user_id="user123",
+                action=AuditAction.READ,
+                resource_type=ResourceType.OUTLET,
+                resource_id=f"OUT{i:03d}"
+            )
+        
+        assert logger.logs[1].prev_checksum == logger.logs[0].checksum
+        assert logger.verify_range() is True
+        
+        # Delete an entry from the middle of the trail
+        del logger.logs[2]
+        
+        assert logger.verify_range(0, 2) is True
+        assert logger.verify_range() is False
+    
+    def test_verify_all_locates_failures(self):
+        """Test that the full sweep flags each tampered entry and broken link"""
+        logger = AuditLogger()
+        
+        for i in range(6):
+            logger.log(
+                user_id="user123",
+                action=AuditAction.READ,
+                resource_type=ResourceType.OUTLET,
+                resource_id=f"OUT{i:03d}"
+            )
+        assert logger.verify_all().all()
+        
+        logger.logs[1].resource_id = "OUT999"
+        del logger.logs[4]
+        
+        assert logger.verify_all().tolist() == [True, False, True, True, False]
+    
+    def test_json_line_rendered_once(self):
+        """Test that the serialized entry is reused until the entry changes"""
+        logger = AuditLogger()
+        log = logger.log(
+            user_id="user123",
+            action=AuditAction.READ,
+            resource_type=ResourceType.OUTLET,
+            resource_id="OUT001"
+        )
+        
+        line = log.json_line()
+        assert log.json_line() is line
+        assert json.loads(line) == json.loads(log.to_json())
+        
+        log.timestamp = datetime(2020, 1, 1)
+        assert json.loads(log.json_line())["timestamp"] == "2020-01-01T00:00:00"
+    
+    def test_batch_roots(self):
+        """Test that full batches are sealed with a verifiable Merkle root"""
+        logger = AuditLogger()
+        
+        for i in range(300):
+            logger.log("user123", AuditAction.READ, ResourceType.OUTLET, f"OUT{i:03d}")
+        
+        assert sorted(logger.get_batch_roots()) == [0, 1]
+        assert logger.verify_batch(0) is True
+        assert logger.verify_batch(2) is False  # not sealed yet
+        
+        logger.logs[130].resource_id = "OUT999"
+        assert logger.verify_batch(0) is True
+        assert logger.verify_batch(1) is False
+    
+    def test_persist_logs_to_file(self, tmp_path):
+        """Test that logs are appended to the audit log file"""
+        logger = AuditLogger(storage_path=str(tmp_path), fsync_policy="every")
+        
+        for resource_id in ("OUT001", "OUT002"):
+            logger.log(
+                user_id="user123",
+                action=AuditAction.READ,
+                resource_type=ResourceType.OUTLET,
+                resource_id=resource_id
+            )
+        logger.close()
+        
+        lines = (tmp_path / "audit.log").read_text(encoding="utf-8").splitlines()
+        assert len(lines) == 2
+        assert json.loads(lines[1])["resource_id"] == "OUT002"
+    
+    def test_read_persisted_logs(self, tmp_path):
+        """Test streaming persisted logs back with a date window"""
+        logger = AuditLogger(storage_path=str(tmp_path), fsync_policy="every")
+        
+        for i in range(20):
+            logger.log(
+                user_id="user123",
+                action=AuditAction.READ,
+                resource_type=ResourceType.OUTLET,
+                resource_id=f"OUT{i:03d}"
+            )
+            time.sleep(0.001)
+        
+        entries = list(logger.read_persisted_logs())
+        assert [e["resource_id"] for e in entries] == [f"OUT{i:03d}" for i in range(20)]
+        
+        window = list(logger.read_persisted_logs(
+            from_date=logger.logs[5].timestamp,
+            to_date=logger.logs[12].timestamp
+        ))
+        assert [e["resource_id"] for e in window] == [f"OUT{i:03d}" for i in range(5, 13)]
+        logger.close()
+    
+    def test_buffered_writes_reach_file(self, tmp_path):
+        """Test that queued entries are written in order by flush and close"""
+        logger = AuditLogger(storage_path=str(tmp_path), fsync_policy="size")
+        
+        for i in range(1200):
+            logger.log(
+                user_id="user123",
+                action=AuditAction.READ,
+                resource_type=ResourceType.OUTLET,
+                resource_id=f"OUT{i:04d}"
+            )
+        logger.flush()
+        
+        with open(tmp_path / "audit.log") as f:
+            ids = [json.loads(line)["resource_id"] for line in f]
+        assert ids == [f"OUT{i:04d}" for i in range(1200)]
+        logger.close()
+    
+    @pytest.mark.parametrize("fsync_policy", ["every", "size"])
+    def test_log_after_close_reaches_file(self, tmp_path, fsync_policy):
+        """Test that entries logged after close() are still written, not queued"""
+        logger = AuditLogger(storage_path=str(tmp_path), fsync_policy=fsync_policy)
+        
+        logger.log("user123", AuditAction.READ, ResourceType.OUTLET, "OUT001")
+        logger.close()
+        logger.log("user123", AuditAction.LOGOUT, ResourceType.USER, "user123")
+        logger.flush()
+        logger.close()
+        
+        with open(tmp_path / "audit.log") as f:
+            ids = [json.loads(line)["resource_id"] for line in f]
+        assert ids == ["OUT001", "user123"]
+    
+    def test_failed_write_raises_from_flush(self, tmp_path, monkeypatch):
+        """Test that a failing background write surfaces from flush() instead of hanging"""
+        logger = AuditLogger(storage_path=str(tmp_path), fsync_policy="size")
+        writer = logger._writer
+        
+        def failing_write(lines):
+            raise OSError(28, "No space left on device")
+        
+        monkeypatch.setattr(writer, "_write_lines", failing_write)
+        logger.log("user123", AuditAction.READ, ResourceType.OUTLET, "OUT001")
+        with pytest.raises(OSError, match="No space left"):
+            logger.flush()
+        
+        # The writer thread survives the failure and writes later entries
+        monkeypatch.undo()
+        logger.log("user123", AuditAction.READ, ResourceType.OUTLET, "OUT002")
+        logger.flush()
+        assert writer._writer_thread.is_alive()
+        
+        monkeypatch.setattr(writer, "_write_lines", failing_write)
+        logger.log("user123", AuditAction.READ, ResourceType.OUTLET, "OUT003")
+        with pytest.raises(OSError, match="No space left"):
+            logger.close()
+        
+        with open(tmp_path / "audit.log") as f:
+            assert [json.loads(line)["resource_id"] for line in f] == ["OUT002"]
+    
+    def test_max_logs_evicts_oldest(self, tmp_path):
+        """Test that the in-memory store is bounded while the file keeps everything"""
+        logger = AuditLogger(storage_path=str(tmp_path), max_logs=300)
+        
+        for i in range(400):
+            logger.log("user123", AuditAction.READ, ResourceType.OUTLET, f"OUT{i:03d}")
+        
+        assert len(logger.logs) <= 300
+        assert logger.logs[-1].resource_id == "OUT399"
+        assert logger.get_logs(user_id="user123", limit=1)[0].resource_id == "OUT399"
+        assert logger.verify_range() is True
+        assert len(list(logger.read_persisted_logs())) == 400
+        logger.close()
+    
+    def test_invalid_fsync_policy(self):
+        """Test that unknown fsync policies are rejected"""
+        with pytest.raises(ValueError):
+            AuditLogger(fsync_policy="never")
+    
     def test_cleanup_old_logs(self):
         """Test that old logs are cleaned up"""
         logger = AuditLogger()
@@ -277,6 +777,8 @@ class TestAuditLogger:
         
         # Log should be removed
         assert len(logger.logs) == 0
+        assert logger.get_logs(user_id="user123") == []
+        assert logger.verify_log_integrity(log.id) is False
 
 
 class TestAuditLoggerIntegration:
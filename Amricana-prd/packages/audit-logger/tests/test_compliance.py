@@ -5,6 +5,8 @@ import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
+import random
+
 import pytest
 from compliance import (
     ComplianceValidator,
@@ -76,6 +78,18 @@ class TestZATCACompliance:
         vat_violations = [v for v in violations if v.field == 'supplier_vat_number']
         assert len(vat_violations) > 0, "Invalid VAT number should be detected"
     
+    def test_vat_number_format_edge_cases(self):
+        """Test that only 15 ASCII digits starting with 3 and ending with 03 pass"""
+        validator = ComplianceValidator()
+        
+        def vat_violations(vat_number):
+            invoice = {"supplier_vat_number": vat_number}
+            return [v for v in validator.validate_zatca_invoice(invoice) if v.field == 'supplier_vat_number']
+        
+        assert vat_violations("301234567890003") == []
+        for vat_number in ("301234567890003\n", "3" + "\u0661" * 12 + "03", "30123456789000", "201234567890003"):
+            assert len(vat_violations(vat_number)) == 1, vat_number
+    
     def test_incorrect_vat_calculation(self):
         """Test that incorrect VAT calculation is detected"""
         validator = ComplianceValidator()
@@ -95,6 +109,102 @@ class TestZATCACompliance:
         violations = validator.validate_zatca_invoice(invoice_with_wrong_vat)
         vat_calc_violations = [v for v in violations if 'VAT calculation' in v.message]
         assert len(vat_calc_violations) > 0, "Incorrect VAT calculation should be detected"
+    
+    def test_fail_fast_and_quick_check(self):
+        """Test that fail-fast validation stops at the first violation"""
+        validator = ComplianceValidator()
+        
+        incomplete_invoice = {"invoice_number": "INV-2024-001"}
+        
+        assert len(validator.validate_zatca_invoice(incomplete_invoice)) > 1
+        violations = validator.validate_zatca_invoice(incomplete_invoice, fail_fast=True)
+        assert len(violations) == 1
+        assert violations[0].field == 'issue_date'
+        assert validator.is_zatca_compliant(incomplete_invoice) is False
+    
+    def test_repeated_validation_returns_fresh_violations(self):
+        """Test that memoized results are equal but not shared between calls"""
+        validator = ComplianceValidator()
+        
+        invoice = {"invoice_number": "INV-2024-002", "vat_amount": 10.0}
+        
+        first = validator.validate_zatca_invoice(invoice)
+        second = validator.validate_zatca_invoice(dict(invoice))
+        
+        assert [v.message for v in first] == [v.message for v in second]
+        assert first[0] is not second[0]
+        assert len(validator.validate_zatca_invoice(invoice, fail_fast=True)) == 1
+    
+    def test_bulk_invoice_validation(self):
+        """Test vectorized pass/fail validation over a batch of invoices"""
+        validator = ComplianceValidator()
+        
+        def make_invoice(vat_amount):
+            return {
+                "invoice_number": "INV-2024-001",
+                "issue_date": "2024-01-15",
+                "issue_time": "10:30:00",
+                "supplier_vat_number": "301234567890003",
+                "customer_name": "Al-Noor Sweets",
+                "line_items": [{"description": "Baklava"}],
+                "total_excluding_vat": 1000.0,
+                "vat_amount": vat_amount,
+                "total_including_vat": 1000.0 + vat_amount
+            }
+        
+        invoices = [make_invoice(150.0), make_invoice(100.0), {"invoice_number": "INV-2024-003"}]
+        
+        result = validator.validate_zatca_invoices_bulk(invoices)
+        assert result.tolist() == [True, False, False]
+        assert result.tolist() == [validator.is_zatca_compliant(i) for i in invoices]
+    
+    def test_bulk_vat_check_matches_single_check(self):
+        """Test that bulk and per-invoice VAT checks agree at rounding boundaries"""
+        validator = ComplianceValidator()
+        rng = random.Random(42)
+        
+        def make_invoice(total, vat_amount):
+            return {
+                "invoice_number": "INV-2024-001",
+                "issue_date": "2024-01-15",
+                "issue_time": "10:30:00",
+                "supplier_vat_number": "301234567890003",
+                "customer_name": "Al-Noor Sweets",
+                "line_items": [{"description": "Baklava"}],
+                "total_excluding_vat": total,
+                "vat_amount": vat_amount,
+                "total_including_vat": total + vat_amount
+            }
+        
+        # 2-decimal totals with VAT 0 to 2 cents off; 332.99 * 0.15 = 49.9485 rounds up
+        invoices = [make_invoice(332.99, 49.94), make_invoice(332.99, 49.97)]
+        for _ in range(20000):
+            total = rng.randint(1, 10_000_000) / 100
+            vat_amount = round(round(total * 0.15, 2) + rng.randint(-2, 2) / 100, 2)
+            invoices.append(make_invoice(total, vat_amount))
+        
+        result = validator.validate_zatca_invoices_bulk(invoices)
+        assert result.tolist() == [validator.is_zatca_compliant(i) for i in invoices]
+        
+        # Non-numeric totals are rejected, as by the per-invoice check
+        with pytest.raises(TypeError):
+            validator.validate_zatca_invoices_bulk([make_invoice(1000.0, 150.0) | {"vat_amount": "150"}])
+    
+    def test_validate_batch_matches_single_validation(self):
+        """Test that parallel batch validation returns per-invoice results in order"""
+        validator = ComplianceValidator()
+        
+        invoices = [
+            {"invoice_number": f"INV-{i}", "supplier_vat_number": "301234567890003" if i % 3 else "123"}
+            for i in range(1200)
+        ]
+        
+        results = validator.validate_batch(invoices, workers=2)
+        
+        assert len(results) == len(invoices)
+        expected = [validator.validate_zatca_invoice(invoice) for invoice in invoices]
+        assert [[v.message for v in r] for r in results] == [[v.message for v in r] for r in expected]
+        assert validator.violations == []
 
 
 class TestPDPLCompliance:
@@ -129,6 +239,7 @@ class TestPDPLCompliance:
         violations = validator.validate_pdpl_data(data_with_encrypted_pii, "customer")
         pii_violations = [v for v in violations if 'encrypted' in v.message]
         assert len(pii_violations) == 0, "Encrypted PII should pass validation"
+        assert validator.is_pdpl_compliant(data_with_encrypted_pii, "customer") is True
     
     def test_missing_consent_detected(self):
         """Test that missing consent documentation is detected"""
@@ -260,6 +371,78 @@ class TestComplianceReport:
         assert report['by_severity']['medium'] == 1
         assert report['is_compliant'] is False
         assert report['critical_violations'] == 1
+    
+    def test_compliance_report_tracks_list_changes(self):
+        """Test that report counts follow appends and removals"""
+        validator = ComplianceValidator()
+        
+        violation = ComplianceViolation(
+            standard=ComplianceStandard.HIPAA,
+            severity='critical',
+            message='Test violation'
+        )
+        validator.violations.append(violation)
+        validator.violations.extend([
+            ComplianceViolation(standard=ComplianceStandard.PDPL, severity='low', message='Low')
+        ])
+        
+        report = validator.get_compliance_report()
+        assert report['critical_violations'] == 1
+        assert report['by_standard'] == {ComplianceStandard.HIPAA: 1, ComplianceStandard.PDPL: 1}
+        
+        validator.violations.remove(violation)
+        del validator.violations[:]
+        
+        report = validator.get_compliance_report()
+        assert report['total_violations'] == 0
+        assert report['by_standard'] == {}
+        assert report['by_severity'] == {'critical': 0, 'high': 0, 'medium': 0, 'low': 0}
+        assert report['is_compliant'] is True
+    
+    def test_compliance_report_augmented_assignment(self):
+        """Test that += keeps the live list and its counts instead of rebuilding them"""
+        validator = ComplianceValidator()
+        violations = validator.violations
+        
+        for i in range(3):
+            validator.violations += [
+                ComplianceViolation(standard=ComplianceStandard.PDPL, severity='high', message=f'V{i}')
+            ]
+        
+        assert validator.violations is violations
+        report = validator.get_compliance_report()
+        assert report['total_violations'] == 3
+        assert report['by_severity']['high'] == 3
+        assert report['by_standard'] == {ComplianceStandard.PDPL: 3}
+        
+        # Assigning a plain list still replaces and counts it
+        validator.violations = []
+        assert validator.violations is not violations
+        assert validator.get_compliance_report()['total_violations'] == 0
+    
+    def test_compliance_report_survives_failed_slice_assignment(self):
+        """Test that a rejected slice assignment leaves the counts unchanged"""
+        validator = ComplianceValidator()
+        validator.violations.extend([
+            ComplianceViolation(standard=ComplianceStandard.HIPAA, severity='critical', message=f'V{i}')
+            for i in range(4)
+        ])
+        
+        # Extended slices must be replaced by a sequence of the same length
+        with pytest.raises(ValueError):
+            validator.violations[::2] = []
+        
+        report = validator.get_compliance_report()
+        assert report['total_violations'] == 4
+        assert report['critical_violations'] == 4
+        assert report['by_standard'] == {ComplianceStandard.HIPAA: 4}
+        
+        validator.violations[::2] = [
+            ComplianceViolation(standard=ComplianceStandard.PDPL, severity='low', message='Low')
+        ] * 2
+        report = validator.get_compliance_report()
+        assert report['critical_violations'] == 2
+        assert report['by_standard'] == {ComplianceStandard.HIPAA: 2, ComplianceStandard.PDPL: 2}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+# BRAINSAIT: Encryption service tests
+# SECURITY: Test suite for field-level encryption
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import base64
+import struct
+
+import pytest
+from cryptography.fernet import InvalidToken
+from encryption import EncryptionService, _KDF_SALT, _derive_key
+
+
+@pytest.fixture(scope="module")
+def service():
+    """Shared service; HKDF keeps key derivation cheap"""
+    return EncryptionService(master_key="test-master-key", kdf="hkdf")
+
+
+@pytest.fixture(scope="module")
+def pbkdf2_service():
+    """Shared service on the default KDF (PBKDF2, derived once per module)"""
+    return EncryptionService(master_key="test-master-key")
+
+
+def _token_time(encrypted: str) -> int:
+    """Timestamp field of the Fernet token inside an encrypted value"""
+    token = base64.urlsafe_b64decode(base64.urlsafe_b64decode(encrypted))
+    return struct.unpack(">Q", token[1:9])[0]
+
+
+class TestEncryptionService:
+    """Test EncryptionService class"""
+    
+    def test_encrypt_decrypt_round_trip(self, service):
+        """Test that decrypt reverses encrypt"""
+        encrypted = service.encrypt("1234567890")
+        
+        assert encrypted != "1234567890"
+        assert service.decrypt(encrypted) == "1234567890"
+    
+    def test_encrypt_dict_round_trip(self, service):
+        """Test that batch-encrypted fields decrypt to their original values"""
+        record = {
+            "name": "Al-Noor Sweets",
+            "national_id": "1012345678",
+            "phone": "+966500000000",
+            "email": "owner@example.com",
+            "credit_limit": 50000,
+            "address": None
+        }
+        
+        encrypted = service.encrypt_pii(service.encrypt_financial(record))
+        
+        assert encrypted["name"] == "Al-Noor Sweets"
+        assert encrypted["address"] is None
+        for field in ("national_id", "phone", "email", "credit_limit"):
+            assert encrypted[field] != str(record[field])
+        # Every field gets its own IV even within one batch
+        same = service.encrypt_dict({"a": "x", "b": "x"}, ["a", "b"])
+        assert same["a"] != same["b"]
+        assert service.decrypt(same["a"]) == service.decrypt(same["b"]) == "x"
+        
+        decrypted = service.decrypt_dict(
+            encrypted, ["national_id", "phone", "email", "credit_limit"]
+        )
+        assert decrypted["national_id"] == "1012345678"
+        assert decrypted["phone"] == "+966500000000"
+        assert decrypted["email"] == "owner@example.com"
+        assert decrypted["credit_limit"] == "50000"
+    
+    def test_encrypt_dict_without_matching_fields(self, service):
+        """Test that a record with nothing to encrypt is returned unchanged"""
+        assert service.encrypt_pii({"name": "Al-Noor Sweets"}) == {"name": "Al-Noor Sweets"}
+    
+    def test_default_kdf_round_trip(self, pbkdf2_service, service):
+        """Test that the default PBKDF2 path encrypts and decrypts"""
+        assert pbkdf2_service.kdf == "pbkdf2"
+        encrypted = pbkdf2_service.encrypt("مهلبية بالفستق")
+        
+        assert pbkdf2_service.decrypt(encrypted) == "مهلبية بالفستق"
+        # The KDFs derive different keys
+        with pytest.raises(InvalidToken):
+            service.decrypt(encrypted)
+    
+    def test_default_kdf_batch_round_trip(self, pbkdf2_service):
+        """Test that the batch path shares one timestamp and round-trips on PBKDF2"""
+        record = {"iban": "SA0380000000608010167519", "swift_code": "RJHISARI", "credit_limit": 0}
+        
+        encrypted = pbkdf2_service.encrypt_financial(record)
+        
+        fields = ["iban", "swift_code", "credit_limit"]
+        assert len({_token_time(encrypted[field]) for field in fields}) == 1
+        assert pbkdf2_service.decrypt_dict(encrypted, fields) == {
+            "iban": "SA0380000000608010167519", "swift_code": "RJHISARI", "credit_limit": "0"
+        }
+        assert pbkdf2_service._encrypt_many([]) == []
+    
+    def test_derive_key_cached_per_input(self):
+        """Test that derivation is deterministic per input and differs across salts"""
+        key = _derive_key("test-master-key", _KDF_SALT, "pbkdf2")
+        
+        assert _derive_key("test-master-key", _KDF_SALT, "pbkdf2") is key
+        assert _derive_key("test-master-key", b"another_salt", "pbkdf2") != key
+        assert _derive_key("other-master-key", _KDF_SALT, "pbkdf2") != key
+        assert _derive_key("test-master-key", _KDF_SALT, "hkdf") != key
+        
+        # A new service reuses the cached key: its tokens decrypt with the first one's
+        first = EncryptionService(master_key="test-master-key")
+        second = EncryptionService(master_key="test-master-key")
+        assert second.decrypt(first.encrypt("1012345678")) == "1012345678"
+    
+    def test_unknown_kdf_rejected(self):
+        """Test that unknown key derivation functions are rejected"""
+        with pytest.raises(ValueError):
+            EncryptionService(master_key="test-master-key", kdf="md5")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,215 @@
+# BRAINSAIT: Security middleware tests
+# SECURITY: Test suite for rate limiting, client info and endpoint auditing
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import asyncio
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials
+from src import middleware
+from src.middleware import (
+    RATE_LIMIT_MAX_REQUESTS,
+    RATE_LIMIT_WINDOW_SECONDS,
+    SecureEndpoint,
+    SecurityMiddleware,
+    _client_info
+)
+from src.audit_logger import AuditLogger, AuditAction, ResourceType, SeverityLevel
+
+
+class _Clock:
+    """Stand-in for the time module with a settable monotonic clock"""
+    
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+    
+    def monotonic(self) -> float:
+        return self.now
+
+
+def _scope(headers=(), client=("198.51.100.9", 50000), path="/outlets"):
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "headers": list(headers),
+        "client": client,
+    }
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controlled monotonic time for the rate limiter"""
+    clock = _Clock()
+    monkeypatch.setattr(middleware, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def rate_limited_app(clock):
+    """SecurityMiddleware around an app that answers 200, with its own audit logger"""
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    security = SecurityMiddleware(app)
+    security.audit_logger = AuditLogger()
+    return security
+
+
+def _request(security, scope) -> int:
+    """Run one request through the middleware; return the response status"""
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(security(scope, None, send))
+    return sent[0]["status"]
+
+
+class TestRateLimiting:
+    """Test the bucketed sliding-window rate limiter"""
+    
+    def test_rejects_at_limit(self, rate_limited_app):
+        """Test that the request after the limit is rejected and audited once"""
+        security = rate_limited_app
+        scope = _scope()
+        
+        statuses = [_request(security, scope) for _ in range(RATE_LIMIT_MAX_REQUESTS)]
+        assert statuses == [200] * RATE_LIMIT_MAX_REQUESTS
+        assert _request(security, scope) == 429
+        
+        events = security.audit_logger.logs
+        assert len(events) == 1
+        assert events[0].severity == SeverityLevel.WARNING
+        assert events[0].details["event_type"] == "rate_limit_exceeded"
+        assert events[0].details["ip_address"] == "198.51.100.9"
+        
+        # Other clients are counted separately
+        assert _request(security, _scope(client=("198.51.100.10", 50000))) == 200
+    
+    def test_recovers_after_window_rolls(self, rate_limited_app, clock):
+        """Test that requests are allowed again once the window has moved past them"""
+        security = rate_limited_app
+        scope = _scope()
+        for _ in range(RATE_LIMIT_MAX_REQUESTS):
+            _request(security, scope)
+        
+        # Still inside the window one bucket before it ends
+        clock.now += RATE_LIMIT_WINDOW_SECONDS * 0.9
+        assert _request(security, scope) == 429
+        
+        clock.now += RATE_LIMIT_WINDOW_SECONDS * 0.1
+        assert _request(security, scope) == 200
+    
+    def test_idle_clients_forgotten(self, rate_limited_app, clock):
+        """Test that a client with no requests in the window is dropped from the table"""
+        security = rate_limited_app
+        _request(security, _scope())
+        assert "198.51.100.9" in security.request_counts
+        
+        clock.now += RATE_LIMIT_WINDOW_SECONDS * 2
+        assert security._is_rate_limited("198.51.100.9") is False
+        assert "198.51.100.9" not in security.request_counts
+
+
+class TestClientInfo:
+    """Test client IP and user agent extraction from the ASGI scope"""
+    
+    def test_multi_hop_forwarded_for(self):
+        """Test that the first X-Forwarded-For hop is the client"""
+        scope = _scope(headers=[
+            (b"x-forwarded-for", b" 203.0.113.7 , 10.0.0.1, 10.0.0.2"),
+            (b"user-agent", b"Mozilla/5.0"),
+        ])
+        assert _client_info(scope) == ("203.0.113.7", "Mozilla/5.0")
+    
+    def test_repeated_headers_first_wins(self):
+        """Test that the first of repeated headers is used"""
+        scope = _scope(headers=[
+            (b"x-forwarded-for", b"203.0.113.7"),
+            (b"user-agent", b"first"),
+            (b"x-forwarded-for", b"192.0.2.1"),
+            (b"user-agent", b"second"),
+        ])
+        assert _client_info(scope) == ("203.0.113.7", "first")
+    
+    def test_missing_headers(self):
+        """Test fallbacks to the peer address and to "unknown" """
+        assert _client_info(_scope()) == ("198.51.100.9", None)
+        assert _client_info(_scope(headers=[(b"x-forwarded-for", b"")])) == ("198.51.100.9", None)
+        assert _client_info(_scope(client=None)) == ("unknown", None)
+        assert _client_info({"type": "http"}) == ("unknown", None)
+
+
+class TestSecureEndpoint:
+    """Test the SecureEndpoint decorator's permission check and audit entry"""
+    
+    @staticmethod
+    def _endpoint(role: str):
+        endpoint = SecureEndpoint(
+            required_permission="delete:invoice",
+            resource_type=ResourceType.INVOICE,
+            audit_action=AuditAction.DELETE
+        )
+        endpoint.audit_logger = AuditLogger()
+        endpoint._extract_user_role = lambda credentials: role
+        calls = []
+        
+        async def delete_invoice(request, credentials, id):
+            calls.append(id)
+            return {"deleted": id}
+        
+        return endpoint, endpoint(delete_invoice), calls
+    
+    @staticmethod
+    def _call(handler):
+        request = Request(_scope(
+            headers=[(b"x-forwarded-for", b"203.0.113.7, 10.0.0.1"), (b"user-agent", b"pytest")],
+            path="/invoices/INV001"
+        ))
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="token")
+        return asyncio.run(handler(request=request, credentials=credentials, id="INV001"))
+    
+    def test_allowed_request_logged_once(self):
+        """Test that a permitted request writes one INFO entry and runs the endpoint"""
+        endpoint, handler, calls = self._endpoint("super_admin")
+        
+        assert self._call(handler) == {"deleted": "INV001"}
+        assert calls == ["INV001"]
+        
+        logs = endpoint.audit_logger.logs
+        assert len(logs) == 1
+        assert logs[0].action == AuditAction.DELETE
+        assert logs[0].severity == SeverityLevel.INFO
+        assert logs[0].resource_id == "INV001"
+        assert logs[0].ip_address == "203.0.113.7"
+        assert logs[0].user_agent == "pytest"
+        assert logs[0].details["permission_check"] == "granted"
+    
+    def test_denied_request_logged_once(self):
+        """Test that a refused request writes one ACCESS_DENIED warning, then 403"""
+        endpoint, handler, calls = self._endpoint("driver")
+        
+        with pytest.raises(HTTPException) as excinfo:
+            self._call(handler)
+        assert excinfo.value.status_code == 403
+        assert calls == []
+        
+        logs = endpoint.audit_logger.logs
+        assert len(logs) == 1
+        assert logs[0].action == AuditAction.ACCESS_DENIED
+        assert logs[0].severity == SeverityLevel.WARNING
+        assert logs[0].details["permission_check"] == "denied"
+        assert logs[0].details["event_type"] == "unauthorized_access"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
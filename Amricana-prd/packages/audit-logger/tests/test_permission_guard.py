@@ -5,113 +5,153 @@ import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
+import numpy as np
 import pytest
 from permission_guard import PermissionGuard
 from audit_logger import AuditLogger, ResourceType, AuditAction
 
 
+# (role, permission, expected) for each role's allowed and denied permissions
+ROLE_MATRIX = [
+    ("super_admin", "read:outlet", True),
+    ("super_admin", "delete:invoice", True),
+    ("super_admin", "anything:anything", True),
+    
+    ("regional_manager", "read:outlet", True),
+    ("regional_manager", "read:report", True),
+    ("regional_manager", "create:sales_rep", True),
+    ("regional_manager", "approve:order", True),
+    ("regional_manager", "delete:invoice", False),
+    ("regional_manager", "delete:outlet", False),
+    
+    ("sales_rep", "read:outlet", True),
+    ("sales_rep", "create:order", True),
+    ("sales_rep", "read:product", True),
+    ("sales_rep", "create:outlet", True),
+    ("sales_rep", "delete:order", False),
+    ("sales_rep", "read:financial", False),
+    ("sales_rep", "approve:order", False),
+    
+    ("driver", "read:route", True),
+    ("driver", "read:order", True),
+    ("driver", "update:order", True),
+    ("driver", "read:vehicle", True),
+    ("driver", "create:order", False),
+    ("driver", "read:invoice", False),
+    ("driver", "read:financial", False),
+    
+    ("finance_officer", "read:invoice", True),
+    ("finance_officer", "create:invoice", True),
+    ("finance_officer", "read:payment", True),
+    ("finance_officer", "read:financial", True),
+    ("finance_officer", "export:financial", True),
+    ("finance_officer", "delete:outlet", False),
+    ("finance_officer", "create:sales_rep", False),
+    
+    ("outlet_owner", "read:outlet", True),
+    ("outlet_owner", "read:order", True),
+    ("outlet_owner", "create:order", True),
+    ("outlet_owner", "read:product", True),
+    ("outlet_owner", "update:outlet", False),
+    ("outlet_owner", "read:financial", False),
+    ("outlet_owner", "read:sales_rep", False),
+]
+
+
+@pytest.fixture(scope="module")
+def guard():
+    """Shared guard for tests that only read the role table"""
+    return PermissionGuard()
+
+
+@pytest.fixture
+def guard_with_audit():
+    """Fresh guard writing to its own audit logger"""
+    return PermissionGuard(AuditLogger())
+
+
 class TestPermissionGuard:
     """Test PermissionGuard class"""
     
-    def test_initialization(self):
+    def test_initialization(self, guard):
         """Test that permission guard initializes correctly"""
-        guard = PermissionGuard()
         assert guard.permissions is not None
         assert len(guard.permissions) == 6  # 6 roles defined
     
-    def test_super_admin_has_all_permissions(self):
-        """Test that super admin has all permissions"""
-        guard = PermissionGuard()
-        
-        # Super admin should have access to everything
-        assert guard.has_permission("super_admin", "read:outlet") is True
-        assert guard.has_permission("super_admin", "delete:invoice") is True
-        assert guard.has_permission("super_admin", "anything:anything") is True
+    @pytest.mark.parametrize("role,permission,expected", ROLE_MATRIX)
+    def test_role_permission(self, guard, role, permission, expected):
+        """Test each role's allowed and denied permissions"""
+        assert guard.has_permission(role, permission) is expected
     
-    def test_regional_manager_permissions(self):
-        """Test regional manager permissions"""
-        guard = PermissionGuard()
-        
-        # Should have these permissions
-        assert guard.has_permission("regional_manager", "read:outlet") is True
-        assert guard.has_permission("regional_manager", "read:report") is True
-        assert guard.has_permission("regional_manager", "create:sales_rep") is True
-        assert guard.has_permission("regional_manager", "approve:order") is True
-        
-        # Should NOT have these permissions
-        assert guard.has_permission("regional_manager", "delete:invoice") is False
-        assert guard.has_permission("regional_manager", "delete:outlet") is False
+    def test_invalid_role(self, guard):
+        """Test that invalid role returns False"""
+        assert guard.has_permission("invalid_role", "read:outlet") is False
     
-    def test_sales_rep_permissions(self):
-        """Test sales rep permissions"""
+    def test_wildcard_permissions(self):
+        """Test that "action:*" grants the action on every resource"""
         guard = PermissionGuard()
-        
-        # Should have these permissions
-        assert guard.has_permission("sales_rep", "read:outlet") is True
-        assert guard.has_permission("sales_rep", "create:order") is True
-        assert guard.has_permission("sales_rep", "read:product") is True
-        assert guard.has_permission("sales_rep", "create:outlet") is True
-        
-        # Should NOT have these permissions
-        assert guard.has_permission("sales_rep", "delete:order") is False
-        assert guard.has_permission("sales_rep", "read:financial") is False
-        assert guard.has_permission("sales_rep", "approve:order") is False
+        guard.set_role_permissions("auditor", ["read:*", "export:financial"])
+        
+        assert guard.has_permission("auditor", "read:invoice") is True
+        assert guard.has_permission("auditor", "read:phi") is True
+        assert guard.has_permission("auditor", "export:financial") is True
+        assert guard.has_permission("auditor", "export:report") is False
+        assert guard.has_permission("auditor", "update:invoice") is False
+        
+        # Changing a role invalidates decisions already made for it
+        guard.set_role_permissions("auditor", ["read:invoice"])
+        assert guard.has_permission("auditor", "read:phi") is False
+        assert guard.has_permission("auditor", "read:invoice") is True
     
-    def test_driver_permissions(self):
-        """Test driver permissions"""
-        guard = PermissionGuard()
-        
-        # Should have these permissions
-        assert guard.has_permission("driver", "read:route") is True
-        assert guard.has_permission("driver", "read:order") is True
-        assert guard.has_permission("driver", "update:order") is True
-        assert guard.has_permission("driver", "read:vehicle") is True
-        
-        # Should NOT have these permissions
-        assert guard.has_permission("driver", "create:order") is False
-        assert guard.has_permission("driver", "read:invoice") is False
-        assert guard.has_permission("driver", "read:financial") is False
+    def test_has_permission_id_matches_has_permission(self, guard):
+        """Test that the id-based check agrees with the string check"""
+        for role, role_id in guard.role_ids.items():
+            for permission, permission_id in guard.permission_ids.items():
+                assert guard.has_permission_id(role_id, permission_id) == \
+                    guard.has_permission(role, permission)
     
-    def test_finance_officer_permissions(self):
-        """Test finance officer permissions"""
-        guard = PermissionGuard()
-        
-        # Should have these permissions
-        assert guard.has_permission("finance_officer", "read:invoice") is True
-        assert guard.has_permission("finance_officer", "create:invoice") is True
-        assert guard.has_permission("finance_officer", "read:payment") is True
-        assert guard.has_permission("finance_officer", "read:financial") is True
-        assert guard.has_permission("finance_officer", "export:financial") is True
-        
-        # Should NOT have these permissions
-        assert guard.has_permission("finance_officer", "delete:outlet") is False
-        assert guard.has_permission("finance_officer", "create:sales_rep") is False
+    def test_has_permission_id_denies_out_of_range_ids(self, guard):
+        """Test that unknown or negative ids are denied rather than wrapped"""
+        super_admin = guard.role_ids["super_admin"]
+        n_roles, n_permissions = len(guard.role_ids), len(guard.permission_ids)
+        # -1 would otherwise wrap to the last role, which holds read:outlet
+        read_outlet = guard.permission_ids["read:outlet"]
+        assert guard.has_permission_id(n_roles - 1, read_outlet) is True
+        
+        assert guard.has_permission_id(-1, read_outlet) is False
+        assert guard.has_permission_id(n_roles, 0) is False
+        assert guard.has_permission_id(super_admin, -1) is False
+        assert guard.has_permission_id(super_admin, n_permissions) is False
     
-    def test_outlet_owner_permissions(self):
-        """Test outlet owner permissions"""
-        guard = PermissionGuard()
-        
-        # Should have these permissions
-        assert guard.has_permission("outlet_owner", "read:outlet") is True
-        assert guard.has_permission("outlet_owner", "read:order") is True
-        assert guard.has_permission("outlet_owner", "create:order") is True
-        assert guard.has_permission("outlet_owner", "read:product") is True
-        
-        # Should NOT have these permissions
-        assert guard.has_permission("outlet_owner", "update:outlet") is False
-        assert guard.has_permission("outlet_owner", "read:financial") is False
-        assert guard.has_permission("outlet_owner", "read:sales_rep") is False
+    def test_has_permissions_bulk_matches_has_permission_id(self, guard):
+        """Test that the bulk check agrees with the single id check"""
+        permission_ids = np.arange(len(guard.permission_ids))
+        for role_id in guard.role_ids.values():
+            granted = guard.has_permissions_bulk(role_id, permission_ids)
+            assert granted.dtype == bool
+            assert granted.tolist() == [
+                guard.has_permission_id(role_id, permission_id)
+                for permission_id in permission_ids.tolist()
+            ]
     
-    def test_invalid_role(self):
-        """Test that invalid role returns False"""
-        guard = PermissionGuard()
-        
-        assert guard.has_permission("invalid_role", "read:outlet") is False
+    def test_has_permissions_bulk_denies_out_of_range_ids(self, guard):
+        """Test that out-of-range ids are denied per entry, not wrapped"""
+        n_roles, n_permissions = len(guard.role_ids), len(guard.permission_ids)
+        read_outlet = guard.permission_ids["read:outlet"]
+        permission_ids = np.array([read_outlet, -1, n_permissions, read_outlet - n_permissions])
+        
+        assert guard.has_permissions_bulk(
+            guard.role_ids["super_admin"], permission_ids
+        ).tolist() == [True, False, False, False]
+        assert guard.has_permissions_bulk(n_roles - 1, permission_ids[:1]).tolist() == [True]
+        assert guard.has_permissions_bulk(-1, permission_ids).tolist() == [False] * 4
+        assert guard.has_permissions_bulk(n_roles, permission_ids).tolist() == [False] * 4
+        assert guard.has_permissions_bulk(0, np.array([], dtype=np.intp)).tolist() == []
     
-    def test_check_access_with_logging(self):
+    def test_check_access_with_logging(self, guard_with_audit):
         """Test that check_access logs access attempts"""
-        audit_logger = AuditLogger()
-        guard = PermissionGuard(audit_logger)
+        guard = guard_with_audit
+        audit_logger = guard.audit_logger
         
         # Successful access
         has_access = guard.check_access(
@@ -139,10 +179,8 @@ class TestPermissionGuard:
         # Last log should be a warning
         assert audit_logger.logs[-1].severity.value == "warning"
     
-    def test_check_resource_ownership(self):
+    def test_check_resource_ownership(self, guard):
         """Test resource ownership validation"""
-        guard = PermissionGuard()
-        
         # Super admin can access any resource
         assert guard.check_resource_ownership(
             user_id="admin1",
@@ -177,10 +215,8 @@ class TestPermissionGuard:
             user_role="sales_rep"
         ) is True
     
-    def test_get_user_permissions(self):
+    def test_get_user_permissions(self, guard):
         """Test getting all permissions for a role"""
-        guard = PermissionGuard()
-        
         # Get sales rep permissions
         permissions = guard.get_user_permissions("sales_rep")
         
@@ -201,10 +237,8 @@ class TestPermissionGuard:
 class TestPermissionGuardIntegration:
     """Integration tests for permission guard"""
     
-    def test_complete_order_workflow(self):
+    def test_complete_order_workflow(self, guard):
         """Test permissions for complete order workflow"""
-        guard = PermissionGuard()
-        
         # Sales rep creates order
         assert guard.has_permission("sales_rep", "create:order") is True
         
@@ -220,20 +254,21 @@ class TestPermissionGuardIntegration:
         # Outlet owner views order
         assert guard.has_permission("outlet_owner", "read:order") is True
     
-    def test_permission_hierarchy(self):
+    def test_permission_hierarchy(self, guard):
         """Test that permission hierarchy is enforced"""
-        guard = PermissionGuard()
-        
         # Super admin has all permissions
+        super_mask = guard._role_masks[guard.role_ids["super_admin"]]
         for role in ["sales_rep", "driver", "finance_officer", "outlet_owner"]:
-            for permission in guard.get_user_permissions(role):
-                if permission != "*":
-                    assert guard.has_permission("super_admin", permission) is True
+            permissions = guard.get_user_permissions(role)
+            for permission in permissions:
+                assert guard.has_permission("super_admin", permission) is True
+                assert guard.has_permission(role, permission) is True
+            # The compiled bitmasks agree: every other role's mask is a subset
+            role_mask = guard._role_masks[guard.role_ids[role]]
+            assert role_mask & ~super_mask == 0
     
-    def test_separation_of_duties(self):
+    def test_separation_of_duties(self, guard):
         """Test that separation of duties is enforced"""
-        guard = PermissionGuard()
-        
         # Sales rep should not have financial permissions
         assert guard.has_permission("sales_rep", "read:financial") is False
         assert guard.has_permission("sales_rep", "export:financial") is False
@@ -1,67 +1,218 @@
 #!/usr/bin/env python3
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+from dataclasses import asdict, dataclass
+import httpx
+import importlib.util
 import json
+import os
 import re
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin, urlparse, urlsplit
 import time
 
+try:
+    import orjson
+except ImportError:  # Optional: stdlib json is used instead
+    orjson = None
+
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:  # Fallback: lxml with precompiled XPath
+    HTMLParser = None
+    try:
+        import lxml.html
+        from lxml.etree import XPath
+    except ImportError:  # Only live scraping parses HTML; main() writes mock data
+        lxml = None
+
+PARSER_MISSING = (
+    "Scraping needs selectolax or lxml: pip install -r scripts/requirements.txt"
+)
+
+# httpx negotiates gzip (and brotli when installed) itself; HTTP/2 needs h2
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+# CSS selectors matching the class substrings the scraper looks for
+PRODUCT_SELECTOR = (
+    'div[class*="product"], div[class*="item"], '
+    'article[class*="product"], article[class*="item"]'
+)
+TITLE_SELECTOR = ', '.join(
+    f'{tag}[class*="{key}"]' for tag in ('h1', 'h2', 'h3', 'h4') for key in ('title', 'name')
+)
+DESCRIPTION_SELECTOR = ', '.join(
+    f'{tag}[class*="{key}"]' for tag in ('p', 'div') for key in ('desc', 'content')
+)
+PRICE_SELECTOR = 'span[class*="price"], div[class*="price"]'
+PRICE_NUMBER_RE = re.compile(r'[\d,]+\.?\d*')
+
+# Arabic names of common sweets and their English names
+TRANSLATIONS = {
+    'كنافة': 'Kunafa',
+    'بقلاوة': 'Baklava',
+    'معمول': 'Maamoul',
+    'قطايف': 'Qatayef',
+    'حلاوة': 'Halawa',
+    'مهلبية': 'Muhallabia',
+    'أم علي': 'Om Ali',
+    'بسبوسة': 'Basbousa',
+    'زلابية': 'Jalebi',
+    'لقمة القاضي': 'Luqmat Al Qadi'
+}
+# Single alternation over all names: one scan tells whether any name occurs
+TRANSLATION_RE = re.compile('|'.join(map(re.escape, TRANSLATIONS)))
+
+if HTMLParser is not None:
+    def parse_product_containers(content):
+        """Product container nodes of a page"""
+        return HTMLParser(content).css(PRODUCT_SELECTOR)
+    
+    def first_text(container, selector):
+        """Stripped text of the first element under container matching selector"""
+        elem = container.css_first(selector)
+        return elem.text(strip=True) if elem else ""
+    
+    def image_source(container):
+        """src (or lazy-load data-src) of the first image under container"""
+        img = container.css_first('img')
+        if not img:
+            return ""
+        return img.attributes.get('src') or img.attributes.get('data-src') or ""
+elif lxml is not None:
+    # The same queries as XPath, compiled once and evaluated by libxml2
+    def _class_query(tags, keys, scope='.//'):
+        tag_test = ' or '.join(f'self::{tag}' for tag in tags)
+        class_test = ' or '.join(f"contains(@class, '{key}')" for key in keys)
+        return XPath(f'{scope}*[{tag_test}][{class_test}]')
+    
+    _PRODUCTS_XPATH = _class_query(('div', 'article'), ('product', 'item'), scope='//')
+    _FIELD_XPATHS = {
+        TITLE_SELECTOR: _class_query(('h1', 'h2', 'h3', 'h4'), ('title', 'name')),
+        DESCRIPTION_SELECTOR: _class_query(('p', 'div'), ('desc', 'content')),
+        PRICE_SELECTOR: _class_query(('span', 'div'), ('price',)),
+    }
+    _IMAGE_XPATH = XPath('.//img')
+    
+    def parse_product_containers(content):
+        """Product container elements of a page"""
+        return _PRODUCTS_XPATH(lxml.html.fromstring(content))
+    
+    def first_text(container, selector):
+        """Stripped text of the first element under container matching selector"""
+        found = _FIELD_XPATHS[selector](container)
+        # Each text node stripped, then joined: what selectolax's text(strip=True) returns
+        return ''.join(text.strip() for text in found[0].itertext()) if found else ""
+    
+    def image_source(container):
+        """src (or lazy-load data-src) of the first image under container"""
+        found = _IMAGE_XPATH(container)
+        if not found:
+            return ""
+        return found[0].get('src') or found[0].get('data-src') or ""
+else:
+    def parse_product_containers(content):
+        """No HTML parser installed"""
+        raise ImportError(PARSER_MISSING)
+
 class AmericanaProductScraper:
     def __init__(self):
         self.base_url = "https://www.americanafoods.com"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        })
+        # Split once; most image paths are root-relative and need only a concatenation
+        self._base_scheme, self._base_netloc = urlsplit(self.base_url)[:2]
+        # One pooled client for every request: connections (HTTP/2 when the h2
+        # package is installed) are reused across URLs on the same origin
+        self.session = httpx.Client(
+            headers={
+                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+            },
+            follow_redirects=True,
+            transport=httpx.HTTPTransport(
+                http2=HTTP2_AVAILABLE,
+                retries=2,
+                limits=httpx.Limits(max_keepalive_connections=32)
+            )
+        )
         
     def scrape_products(self, url):
         """Scrape products from Americana Foods website"""
+        self._require_parser()
         try:
             response = self.session.get(url)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            products = []
-            
-            # Find product containers
-            product_containers = soup.find_all(['div', 'article'], class_=re.compile(r'product|item'))
-            
-            for container in product_containers:
-                product = self.extract_product_data(container)
-                if product:
-                    products.append(product)
-                    
-            return products
+            return self.parse_products(response.content)
             
         except Exception as e:
             print(f"Error scraping {url}: {e}")
             return []
     
+    async def scrape_products_async(self, urls, concurrency=16):
+        """Scrape several pages concurrently; one product list per URL, in order"""
+        self._require_parser()
+        semaphore = asyncio.Semaphore(concurrency)
+        # Configured like self.session: same headers, redirects, timeout, retries and pool
+        async with httpx.AsyncClient(
+            headers=self.session.headers,
+            follow_redirects=self.session.follow_redirects,
+            timeout=self.session.timeout,
+            transport=httpx.AsyncHTTPTransport(
+                http2=HTTP2_AVAILABLE,
+                retries=2,
+                limits=httpx.Limits(max_keepalive_connections=32)
+            )
+        ) as client:
+            return await asyncio.gather(
+                *(self._fetch_and_parse(client, semaphore, url) for url in urls)
+            )
+    
+    async def _fetch_and_parse(self, client, semaphore, url):
+        try:
+            async with semaphore:
+                response = await client.get(url)
+            response.raise_for_status()
+            # Parsing is CPU work; keep it off the event loop
+            return await asyncio.to_thread(self.parse_products, response.content)
+        except Exception as e:
+            print(f"Error scraping {url}: {e}")
+            return []
+    
+    @staticmethod
+    def _require_parser():
+        """Fail before fetching anything when no HTML parser is installed"""
+        if HTMLParser is None and lxml is None:
+            raise ImportError(PARSER_MISSING)
+    
+    def parse_products(self, content):
+        """Extract products from a page's HTML"""
+        products = []
+        
+        # Find product containers
+        product_containers = parse_product_containers(content)
+        
+        for container in product_containers:
+            product = self.extract_product_data(container)
+            if product:
+                products.append(product)
+                
+        return products
+    
     def extract_product_data(self, container):
         """Extract product data from container"""
         try:
             # Extract product name
-            name_elem = container.find(['h1', 'h2', 'h3', 'h4'], class_=re.compile(r'title|name'))
-            name_ar = name_elem.get_text(strip=True) if name_elem else ""
+            name_ar = first_text(container, TITLE_SELECTOR)
             
             # Extract image
-            img_elem = container.find('img')
-            image_url = ""
-            if img_elem:
-                image_url = img_elem.get('src') or img_elem.get('data-src', '')
-                if image_url and not image_url.startswith('http'):
-                    image_url = urljoin(self.base_url, image_url)
+            image_url = image_source(container)
+            if image_url:
+                image_url = self._absolutize(image_url)
             
             # Extract description
-            desc_elem = container.find(['p', 'div'], class_=re.compile(r'desc|content'))
-            description_ar = desc_elem.get_text(strip=True) if desc_elem else ""
+            description_ar = first_text(container, DESCRIPTION_SELECTOR)
             
             # Extract price if available
-            price_elem = container.find(['span', 'div'], class_=re.compile(r'price'))
             price = 0.0
-            if price_elem:
-                price_text = price_elem.get_text(strip=True)
-                price_match = re.search(r'[\d,]+\.?\d*', price_text.replace(',', ''))
+            price_text = first_text(container, PRICE_SELECTOR)
+            if price_text:
+                price_match = PRICE_NUMBER_RE.search(price_text.replace(',', ''))
                 if price_match:
                     price = float(price_match.group())
             
@@ -85,108 +236,115 @@ class AmericanaProductScraper:
             
         return None
     
+    def _absolutize(self, url):
+        """Absolute form of a scraped URL, relative to base_url"""
+        if url.startswith('http'):
+            return url
+        if url.startswith('//'):
+            return f"{self._base_scheme}:{url}"
+        if url.startswith('/') and '/.' not in url:  # dot segments need urljoin's normalization
+            return f"{self._base_scheme}://{self._base_netloc}{url}"
+        return urljoin(self.base_url, url)
+    
     def translate_to_english(self, arabic_text):
         """Simple translation mapping for common sweet names"""
-        translations = {
-            'كنافة': 'Kunafa',
-            'بقلاوة': 'Baklava', 
-            'معمول': 'Maamoul',
-            'قطايف': 'Qatayef',
-            'حلاوة': 'Halawa',
-            'مهلبية': 'Muhallabia',
-            'أم علي': 'Om Ali',
-            'بسبوسة': 'Basbousa',
-            'زلابية': 'Jalebi',
-            'لقمة القاضي': 'Luqmat Al Qadi'
-        }
-        
-        for ar, en in translations.items():
+        # One scan skips text without any known name (most descriptions)
+        if TRANSLATION_RE.search(arabic_text) is None:
+            return arabic_text
+        # Only the first name in table order is translated, as before
+        for ar, en in TRANSLATIONS.items():
             if ar in arabic_text:
                 return arabic_text.replace(ar, en)
-        
-        return arabic_text  # Return original if no translation found
+        return arabic_text
+
+@dataclass(frozen=True, slots=True)
+class Product:
+    """One catalogue entry as written to americana-products.json"""
+    name_ar: str
+    name_en: str
+    description_ar: str
+    description_en: str
+    image_url: str
+    price: float
+    category: str = 'حلويات مبردة'
+    category_en: str = 'Refrigerated Sweets'
+    brand: str = 'Americana'
+    is_active: bool = True
+    requires_refrigeration: bool = True
+    sku: str = ''
+
+# Mock data since we can't actually scrape the website
+# This represents typical Americana refrigerated sweets
+MOCK_PRODUCTS = (
+    Product(
+        name_ar='كنافة بالجبن الطازجة',
+        name_en='Fresh Cheese Kunafa',
+        description_ar='كنافة طازجة محشوة بالجبن الطبيعي',
+        description_en='Fresh kunafa filled with natural cheese',
+        image_url='https://example.com/kunafa.jpg',
+        price=25.50,
+        sku='AMR-KUN-001'
+    ),
+    Product(
+        name_ar='مهلبية بالفستق',
+        name_en='Pistachio Muhallabia',
+        description_ar='مهلبية كريمية مزينة بالفستق الحلبي',
+        description_en='Creamy muhallabia topped with Aleppo pistachios',
+        image_url='https://example.com/muhallabia.jpg',
+        price=18.75,
+        sku='AMR-MUH-001'
+    ),
+    Product(
+        name_ar='أم علي بالمكسرات',
+        name_en='Om Ali with Mixed Nuts',
+        description_ar='أم علي تقليدية بالحليب والمكسرات المشكلة',
+        description_en='Traditional Om Ali with milk and mixed nuts',
+        image_url='https://example.com/omali.jpg',
+        price=22.00,
+        sku='AMR-OMA-001'
+    ),
+    Product(
+        name_ar='تشيز كيك بالتوت',
+        name_en='Berry Cheesecake',
+        description_ar='تشيز كيك كريمي بطبقة التوت الطازج',
+        description_en='Creamy cheesecake with fresh berry topping',
+        image_url='https://example.com/cheesecake.jpg',
+        price=35.00,
+        sku='AMR-CHE-001'
+    ),
+    Product(
+        name_ar='تيراميسو كلاسيك',
+        name_en='Classic Tiramisu',
+        description_ar='تيراميسو إيطالي أصيل بالقهوة والماسكاربوني',
+        description_en='Authentic Italian tiramisu with coffee and mascarpone',
+        image_url='https://example.com/tiramisu.jpg',
+        price=28.50,
+        sku='AMR-TIR-001'
+    )
+)
+
+def write_file(path, data):
+    """Write already-encoded bytes straight to the file descriptor"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
 
 def main():
     scraper = AmericanaProductScraper()
     
-    # Mock data since we can't actually scrape the website
-    # This represents typical Americana refrigerated sweets
-    mock_products = [
-        {
-            'name_ar': 'كنافة بالجبن الطازجة',
-            'name_en': 'Fresh Cheese Kunafa',
-            'description_ar': 'كنافة طازجة محشوة بالجبن الطبيعي',
-            'description_en': 'Fresh kunafa filled with natural cheese',
-            'image_url': 'https://example.com/kunafa.jpg',
-            'price': 25.50,
-            'category': 'حلويات مبردة',
-            'category_en': 'Refrigerated Sweets',
-            'brand': 'Americana',
-            'is_active': True,
-            'requires_refrigeration': True,
-            'sku': 'AMR-KUN-001'
-        },
-        {
-            'name_ar': 'مهلبية بالفستق',
-            'name_en': 'Pistachio Muhallabia',
-            'description_ar': 'مهلبية كريمية مزينة بالفستق الحلبي',
-            'description_en': 'Creamy muhallabia topped with Aleppo pistachios',
-            'image_url': 'https://example.com/muhallabia.jpg',
-            'price': 18.75,
-            'category': 'حلويات مبردة',
-            'category_en': 'Refrigerated Sweets',
-            'brand': 'Americana',
-            'is_active': True,
-            'requires_refrigeration': True,
-            'sku': 'AMR-MUH-001'
-        },
-        {
-            'name_ar': 'أم علي بالمكسرات',
-            'name_en': 'Om Ali with Mixed Nuts',
-            'description_ar': 'أم علي تقليدية بالحليب والمكسرات المشكلة',
-            'description_en': 'Traditional Om Ali with milk and mixed nuts',
-            'image_url': 'https://example.com/omali.jpg',
-            'price': 22.00,
-            'category': 'حلويات مبردة',
-            'category_en': 'Refrigerated Sweets',
-            'brand': 'Americana',
-            'is_active': True,
-            'requires_refrigeration': True,
-            'sku': 'AMR-OMA-001'
-        },
-        {
-            'name_ar': 'تشيز كيك بالتوت',
-            'name_en': 'Berry Cheesecake',
-            'description_ar': 'تشيز كيك كريمي بطبقة التوت الطازج',
-            'description_en': 'Creamy cheesecake with fresh berry topping',
-            'image_url': 'https://example.com/cheesecake.jpg',
-            'price': 35.00,
-            'category': 'حلويات مبردة',
-            'category_en': 'Refrigerated Sweets',
-            'brand': 'Americana',
-            'is_active': True,
-            'requires_refrigeration': True,
-            'sku': 'AMR-CHE-001'
-        },
-        {
-            'name_ar': 'تيراميسو كلاسيك',
-            'name_en': 'Classic Tiramisu',
-            'description_ar': 'تيراميسو إيطالي أصيل بالقهوة والماسكاربوني',
-            'description_en': 'Authentic Italian tiramisu with coffee and mascarpone',
-            'image_url': 'https://example.com/tiramisu.jpg',
-            'price': 28.50,
-            'category': 'حلويات مبردة',
-            'category_en': 'Refrigerated Sweets',
-            'brand': 'Americana',
-            'is_active': True,
-            'requires_refrigeration': True,
-            'sku': 'AMR-TIR-001'
-        }
-    ]
-    
-    # Save to JSON file
-    with open('/Users/fadil369/Amricana-prd/data/americana-products.json', 'w', encoding='utf-8') as f:
-        json.dump(mock_products, f, ensure_ascii=False, indent=2)
+    mock_products = [asdict(product) for product in MOCK_PRODUCTS]
+    
+    # Save to JSON file (UTF-8, Arabic kept as-is)
+    output_path = '/Users/fadil369/Amricana-prd/data/americana-products.json'
+    if orjson is not None:
+        data = orjson.dumps(mock_products, option=orjson.OPT_INDENT_2)
+    else:
+        data = json.dumps(mock_products, ensure_ascii=False, indent=2).encode('utf-8')
+    write_file(output_path, data)
     
     print(f"✅ Extracted {len(mock_products)} products from Americana Foods")
     print("📁 Saved to: data/americana-products.json")
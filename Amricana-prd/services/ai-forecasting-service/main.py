@@ -2,119 +2,167 @@
 # DISTRIBUTIONLINC: AI-powered intelligence layer
 # NEURAL: Machine learning demand forecasting and optimization
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Query, Response
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel, Field
+import functools
+import json
+import time
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-import joblib
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # Optional: stdlib json is used instead
+    orjson = None
 
 app = FastAPI(
     title="SSDP AI Forecasting Service",
     description="AI-powered demand forecasting for Saudi sweet distribution",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse
 )
 
+# Cultural demand multiplier by [month, day] (index 0 unused). Filled lowest
+# priority first, so Ramadan wins over the May Eid week as in the original rules
+CULTURAL_BY_MD = np.ones((13, 32))
+CULTURAL_BY_MD[9, 23] = 2.5  # Saudi National Day
+CULTURAL_BY_MD[5, 1:8] = 9.0  # Eid periods
+CULTURAL_BY_MD[7, 1:8] = 9.0
+CULTURAL_BY_MD[3:6, :] = 4.5  # Ramadan surge (approximate - needs Hijri calendar integration)
+# Weekend (Thursday-Friday in Saudi) multiplier, for days without an occasion
+WEEKEND_MULTIPLIER = 1.4
+
+# Seasonal adjustment for Saudi climate by month (index 0 unused)
+SEASONAL_BY_MONTH = np.ones(13)
+SEASONAL_BY_MONTH[[11, 12, 1, 2]] = 1.25  # Cooler months (higher sweet consumption)
+SEASONAL_BY_MONTH[[6, 7, 8]] = 0.85  # Hot summer months
+
+# (epoch second, its isoformat()); replaced as one tuple so readers never see a
+# second paired with another second's string
+_clock = (None, "")
+
+def _now_iso() -> str:
+    """datetime.now().isoformat() to the second, formatted once per second"""
+    global _clock
+    second = int(time.time())
+    if second != _clock[0]:
+        _clock = (second, datetime.fromtimestamp(second).isoformat())
+    return _clock[1]
+
+def _dumps(content) -> bytes:
+    """JSON response body, encoded the way FastAPI's JSONResponse would"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+# Base-demand noise sampled once per process (PCG64, fixed seed) and consumed as
+# a ring buffer, so a forecast slices noise instead of drawing it per request
+NOISE_BUFFER_SIZE = 8192
+_BASE_NOISE = np.random.default_rng(42).normal(0, 100, size=NOISE_BUFFER_SIZE)
+
+# Demand reasons (Arabic, English) by cultural multiplier, highest threshold first
+REASON_TABLE = (
+    (8, "عيد الفطر - ذروة الطلب", "Eid celebration - Peak demand"),
+    (4, "فترة رمضان - زيادة كبيرة في الطلب", "Ramadan period - High demand surge"),
+    (2, "اليوم الوطني السعودي", "Saudi National Day"),
+    (1.3, "نهاية الأسبوع", "Weekend"),
+    (float("-inf"), "يوم عادي", "Regular day")
+)
+
+# The same table as arrays for np.digitize: REASON_THRESHOLDS ascending, and
+# REASONS_AR/REASONS_EN indexed by the number of thresholds a multiplier exceeds
+REASON_THRESHOLDS = np.array([threshold for threshold, _, _ in reversed(REASON_TABLE[:-1])])
+REASONS_AR = np.array([ar for _, ar, _ in reversed(REASON_TABLE)], dtype=object)
+REASONS_EN = np.array([en for _, _, en in reversed(REASON_TABLE)], dtype=object)
+
 class SweetDemandForecaster:
     def __init__(self):
-        self.model = RandomForestRegressor(n_estimators=100, random_state=42)
-        self.scaler = StandardScaler()
-        self.is_trained = False
+        self._noise_idx = 0  # next unread position in _BASE_NOISE
         
     def get_cultural_multiplier(self, date: datetime) -> float:
         """Get demand multiplier based on Saudi cultural calendar"""
-        month = date.month
-        day = date.day
-        
-        # Ramadan surge (approximate - needs Hijri calendar integration)
-        if month in [3, 4, 5]:  # Ramadan period varies
-            return 4.5
-        
-        # Eid periods
-        if (month == 5 and day <= 7) or (month == 7 and day <= 7):
-            return 9.0
-        
-        # Saudi National Day
-        if month == 9 and day == 23:
-            return 2.5
-        
-        # Weekend (Thursday-Friday in Saudi)
-        if date.weekday() in [3, 4]:
-            return 1.4
-        
-        return 1.0
+        multiplier = float(CULTURAL_BY_MD[date.month, date.day])
+        if multiplier == 1.0 and date.weekday() in (3, 4):
+            return WEEKEND_MULTIPLIER
+        return multiplier
     
     def get_seasonal_factor(self, date: datetime) -> float:
         """Seasonal adjustment for Saudi climate"""
-        month = date.month
-        
-        # Cooler months (higher sweet consumption)
-        if month in [11, 12, 1, 2]:
-            return 1.25
-        # Hot summer months
-        elif month in [6, 7, 8]:
-            return 0.85
-        else:
-            return 1.0
+        return float(SEASONAL_BY_MONTH[date.month])
     
     def forecast_demand(self, days_ahead: int = 30, region: str = "Riyadh") -> List[Dict]:
         """Generate demand forecast"""
-        forecast_dates = pd.date_range(
-            start=datetime.now(),
-            periods=days_ahead,
-            freq='D'
-        )
-        
-        predictions = []
-        
-        for date in forecast_dates:
-            # Base demand (mock historical average)
-            base_demand = 1000 + np.random.normal(0, 100)
-            
-            # Apply cultural and seasonal factors
-            cultural_factor = self.get_cultural_multiplier(date)
-            seasonal_factor = self.get_seasonal_factor(date)
-            
-            forecasted_demand = base_demand * cultural_factor * seasonal_factor
-            
-            predictions.append({
-                "date": date.isoformat(),
+        now = datetime.now()
+        demand, build_forecast = _make_forecast(days_ahead, now.date())
+        return build_forecast(now, demand(self.next_noise(days_ahead)), region)
+    
+    def next_noise(self, days_ahead: int) -> np.ndarray:
+        """Base-demand noise (mock historical variation) for the next days_ahead days"""
+        noise_idx = self._noise_idx
+        self._noise_idx = (noise_idx + days_ahead) % NOISE_BUFFER_SIZE
+        return _BASE_NOISE.take(np.arange(noise_idx, noise_idx + days_ahead), mode='wrap')
+
+# Specialized forecast builders kept; callers mostly ask for 7/14/30/90 days from today
+FORECAST_BUILDER_CACHE_SIZE = 8
+
+@functools.lru_cache(maxsize=FORECAST_BUILDER_CACHE_SIZE)
+def _make_forecast(days_ahead: int, start: date):
+    """
+    Forecast builders specialized for days_ahead days from start, as
+    (demand, build_forecast): demand turns base-demand noise into forecasted
+    units, and build_forecast lays units out as predictions for a time of day
+    and region. Dates, factors and reasons are computed once
+    """
+    forecast_dates = pd.date_range(start=start, periods=days_ahead, freq='D')
+    months = forecast_dates.month.to_numpy()
+    days = forecast_dates.day.to_numpy()
+    weekdays = forecast_dates.weekday.to_numpy()
+    
+    # Cultural and seasonal factors for every date: one gather per table,
+    # then the weekend multiplier on days without an occasion
+    cultural = CULTURAL_BY_MD[months, days]
+    cultural[(cultural == 1.0) & ((weekdays == 3) | (weekdays == 4))] = WEEKEND_MULTIPLIER
+    seasonal = SEASONAL_BY_MONTH[months]
+    
+    # Reasons gathered by reason index; every row shares the table's string objects
+    reason_idx = np.digitize(cultural, REASON_THRESHOLDS, right=True)
+    
+    # Everything per date except the forecast itself, in output order
+    rows = list(zip(
+        forecast_dates.strftime('%Y-%m-%d').tolist(),
+        cultural.tolist(),
+        seasonal.tolist(),
+        REASONS_AR[reason_idx].tolist(),
+        REASONS_EN[reason_idx].tolist()
+    ))
+    
+    def demand(noise: np.ndarray) -> List[float]:
+        return np.round((1000 + noise) * cultural * seasonal, 2).tolist()
+    
+    def build_forecast(now: datetime, forecasted_units: List[float], region: str) -> List[Dict]:
+        time_of_day = now.isoformat()[10:]  # "THH:MM:SS[.ffffff]", shared by every date
+        return [
+            {
+                "date": day + time_of_day,
                 "region": region,
-                "forecasted_units": round(forecasted_demand, 2),
+                "forecasted_units": units,
                 "cultural_multiplier": cultural_factor,
                 "seasonal_factor": seasonal_factor,
                 "confidence": 0.85,
-                "reason_ar": self._get_reason_arabic(date, cultural_factor),
-                "reason_en": self._get_reason_english(date, cultural_factor)
-            })
-        
-        return predictions
+                "reason_ar": reason_ar,
+                "reason_en": reason_en
+            }
+            for (day, cultural_factor, seasonal_factor, reason_ar, reason_en), units in zip(
+                rows, forecasted_units
+            )
+        ]
     
-    def _get_reason_arabic(self, date: datetime, multiplier: float) -> str:
-        if multiplier > 4:
-            return "فترة رمضان - زيادة كبيرة في الطلب"
-        elif multiplier > 8:
-            return "عيد الفطر - ذروة الطلب"
-        elif multiplier > 2:
-            return "اليوم الوطني السعودي"
-        elif multiplier > 1.3:
-            return "نهاية الأسبوع"
-        else:
-            return "يوم عادي"
-    
-    def _get_reason_english(self, date: datetime, multiplier: float) -> str:
-        if multiplier > 4:
-            return "Ramadan period - High demand surge"
-        elif multiplier > 8:
-            return "Eid celebration - Peak demand"
-        elif multiplier > 2:
-            return "Saudi National Day"
-        elif multiplier > 1.3:
-            return "Weekend"
-        else:
-            return "Regular day"
+    return demand, build_forecast
 
 # Initialize forecaster
 forecaster = SweetDemandForecaster()
@@ -123,18 +171,39 @@ forecaster = SweetDemandForecaster()
 async def root():
     return {"message": "SSDP AI Forecasting Service", "version": "1.0.0"}
 
+# Longest forecast period served by /forecast/demand
+MAX_FORECAST_DAYS = 365
+
+# Distinct forecast periods whose units are kept per day
+DEMAND_FORECAST_CACHE_SIZE = 128
+
+@functools.lru_cache(maxsize=DEMAND_FORECAST_CACHE_SIZE)
+def _demand_units(days_ahead: int, day: date) -> Tuple[float, ...]:
+    """
+    Forecasted units for days_ahead days from day, drawn once per period and day
+    Every region and response that day reports the same numbers; the
+    timestamps are stamped per response
+    """
+    demand, _ = _make_forecast(days_ahead, day)
+    return tuple(demand(forecaster.next_noise(days_ahead)))
+
 @app.get("/forecast/demand")
-async def get_demand_forecast(days_ahead: int = 30, region: str = "Riyadh"):
+async def get_demand_forecast(
+    days_ahead: int = Query(30, ge=1, le=MAX_FORECAST_DAYS),
+    region: str = "Riyadh"
+):
     """Get demand forecast for specified region and time period"""
     try:
-        forecast = forecaster.forecast_demand(days_ahead, region)
-        return {
+        now = datetime.now()
+        _, build_forecast = _make_forecast(days_ahead, now.date())
+        forecast = build_forecast(now, _demand_units(days_ahead, now.date()), region)
+        return Response(_dumps({
             "status": "success",
             "region": region,
             "forecast_period": f"{days_ahead} days",
-            "generated_at": datetime.now().isoformat(),
+            "generated_at": now.isoformat(),
             "predictions": forecast
-        }
+        }), media_type="application/json")
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
@@ -147,11 +216,17 @@ async def get_product_forecast():
         {"id": "PRD003", "name": "معمول", "name_en": "Maamoul"}
     ]
     
+    # One base forecast shared by every product, so all products see the same
+    # days: the day's 7-day units (as served by /forecast/demand), stamped now
+    now = datetime.now()
+    _, build_forecast = _make_forecast(7, now.date())
+    base_forecast = build_forecast(now, _demand_units(7, now.date()), "Riyadh")
+    
     forecasts = []
     for product in products:
-        base_forecast = forecaster.forecast_demand(7, "Riyadh")
+        forecast = [prediction.copy() for prediction in base_forecast]
         # Adjust for product-specific factors
-        for prediction in base_forecast:
+        for prediction in forecast:
             if product["id"] == "PRD001":  # Baklava more popular in winter
                 prediction["forecasted_units"] *= 1.2
             elif product["id"] == "PRD003":  # Maamoul peaks during Eid
@@ -160,10 +235,30 @@ async def get_product_forecast():
         
         forecasts.append({
             "product": product,
-            "forecast": base_forecast[:7]  # 7 days
+            "forecast": forecast[:7]  # 7 days
         })
     
-    return {"product_forecasts": forecasts}
+    return Response(_dumps({"product_forecasts": forecasts}), media_type="application/json")
+
+# Pricing factor bands for np.searchsorted. Inventory bins with side="right" on
+# [50, 100, just above 500]: <50, <100, <=500, >500. Demand bins with side="left"
+# on [just below 500, 1000, 1500]: <500, <=1000, <=1500, >1500
+INVENTORY_THRESHOLDS = np.array([50, 100, np.nextafter(500, np.inf)])
+INVENTORY_FACTORS = np.array([1.15, 1.08, 1.0, 0.92])
+DEMAND_THRESHOLDS = np.array([np.nextafter(500, -np.inf), 1000, 1500])
+DEMAND_FACTORS = np.array([0.95, 1.0, 1.05, 1.12])
+
+# Price recommendations: increase, reduce, keep
+RECOMMENDATIONS_AR = (
+    "يُنصح بزيادة السعر لزيادة الربحية",
+    "يُنصح بتخفيض السعر لزيادة المبيعات",
+    "السعر الحالي مثالي"
+)
+RECOMMENDATIONS_EN = (
+    "Recommend price increase for higher profitability",
+    "Recommend price reduction to boost sales",
+    "Current price is optimal"
+)
 
 class DynamicPricingOptimizer:
     """BRAINSAIT: Dynamic pricing based on demand, inventory, and competition"""
@@ -218,6 +313,7 @@ class DynamicPricingOptimizer:
         
         # Round to nearest 0.5
         optimized_price = round(optimized_price * 2) / 2
+        recommendation = self._get_recommendation(optimized_price, base_price)
         
         return {
             "product_id": product_id,
@@ -229,27 +325,84 @@ class DynamicPricingOptimizer:
                 "demand_factor": demand_factor,
                 "competitor_factor": competitor_factor
             },
-            "recommendation_ar": self._get_recommendation_ar(optimized_price, base_price),
-            "recommendation_en": self._get_recommendation_en(optimized_price, base_price)
+            "recommendation_ar": recommendation[0],
+            "recommendation_en": recommendation[1]
         }
     
-    def _get_recommendation_ar(self, optimized: float, base: float) -> str:
-        change = (optimized - base) / base * 100
-        if change > 5:
-            return "يُنصح بزيادة السعر لزيادة الربحية"
-        elif change < -5:
-            return "يُنصح بتخفيض السعر لزيادة المبيعات"
-        else:
-            return "السعر الحالي مثالي"
+    def optimize_prices(
+        self,
+        product_ids: List[str],
+        current_inventory: List[int],
+        demand_forecast: List[float],
+        competitor_prices: Optional[List[Optional[float]]] = None
+    ) -> List[Dict]:
+        """optimize_price for many products at once, one result per product"""
+        if competitor_prices is None:
+            competitor_prices = [None] * len(product_ids)
+        lengths = {len(product_ids), len(current_inventory), len(demand_forecast), len(competitor_prices)}
+        if len(lengths) > 1:
+            raise ValueError(
+                "product_ids, current_inventory, demand_forecast and competitor_prices "
+                "must have the same length"
+            )
+        
+        base_prices = np.array([self.base_prices.get(pid, 25.0) for pid in product_ids], dtype=float)
+        inventory_factors = INVENTORY_FACTORS[
+            np.searchsorted(INVENTORY_THRESHOLDS, np.asarray(current_inventory, dtype=float), side="right")
+        ]
+        demand_factors = DEMAND_FACTORS[
+            np.searchsorted(DEMAND_THRESHOLDS, np.asarray(demand_forecast, dtype=float), side="left")
+        ]
+        
+        # Missing (None) or zero competitor prices leave the factor at 1.0
+        competitor = np.array([p or np.nan for p in competitor_prices], dtype=float)
+        competitor_factors = np.where(
+            competitor > base_prices * 1.1, 1.05,
+            np.where(competitor < base_prices * 0.9, 0.95, 1.0)
+        )
+        
+        # Round to nearest 0.5
+        optimized_prices = np.round(base_prices * inventory_factors * demand_factors * competitor_factors * 2) / 2
+        
+        # Recommendation per product: 0 increase, 1 reduce, 2 keep
+        change = (optimized_prices - base_prices) / base_prices * 100
+        recommendation_idx = np.where(change > 5, 0, np.where(change < -5, 1, 2))
+        
+        return [
+            {
+                "product_id": product_id,
+                "base_price": base_price,
+                "optimized_price": optimized_price,
+                "price_change_percentage": round((optimized_price - base_price) / base_price * 100, 2),
+                "factors": {
+                    "inventory_factor": inventory_factor,
+                    "demand_factor": demand_factor,
+                    "competitor_factor": competitor_factor
+                },
+                "recommendation_ar": RECOMMENDATIONS_AR[i],
+                "recommendation_en": RECOMMENDATIONS_EN[i]
+            }
+            for product_id, base_price, optimized_price, inventory_factor, demand_factor, competitor_factor, i in zip(
+                product_ids,
+                base_prices.tolist(),
+                optimized_prices.tolist(),
+                inventory_factors.tolist(),
+                demand_factors.tolist(),
+                competitor_factors.tolist(),
+                recommendation_idx.tolist()
+            )
+        ]
     
-    def _get_recommendation_en(self, optimized: float, base: float) -> str:
+    def _get_recommendation(self, optimized: float, base: float) -> Tuple[str, str]:
+        """(Arabic, English) recommendation for a price change"""
         change = (optimized - base) / base * 100
         if change > 5:
-            return "Recommend price increase for higher profitability"
+            i = 0
         elif change < -5:
-            return "Recommend price reduction to boost sales"
+            i = 1
         else:
-            return "Current price is optimal"
+            i = 2
+        return RECOMMENDATIONS_AR[i], RECOMMENDATIONS_EN[i]
 
 class CustomerChurnPredictor:
     """BRAINSAIT: Predict customer churn and retention strategies"""
@@ -308,6 +461,74 @@ class CustomerChurnPredictor:
             "retention_strategies": strategies
         }
     
+    def predict_churn_risk_batch(
+        self,
+        outlet_ids: List[str],
+        days_since_last_order: List[int],
+        average_order_value: List[float],
+        order_frequency: List[float],
+        payment_delays: Optional[List[int]] = None
+    ) -> List[Dict]:
+        """predict_churn_risk for many outlets at once, one result per outlet"""
+        if payment_delays is None:
+            payment_delays = [0] * len(outlet_ids)
+        lengths = {
+            len(outlet_ids), len(days_since_last_order), len(average_order_value),
+            len(order_frequency), len(payment_delays)
+        }
+        if len(lengths) > 1:
+            raise ValueError(
+                "outlet_ids, days_since_last_order, average_order_value, order_frequency "
+                "and payment_delays must have the same length"
+            )
+        
+        # Risk factors and weighted score for every outlet in a few array passes
+        recency_risk = np.minimum(np.asarray(days_since_last_order, dtype=float) / 30, 1.0)
+        value_risk = 1.0 - np.minimum(np.asarray(average_order_value, dtype=float) / 5000, 1.0)
+        frequency_risk = 1.0 - np.minimum(np.asarray(order_frequency, dtype=float) / 4, 1.0)
+        payment_risk = np.minimum(np.asarray(payment_delays, dtype=float) / 5, 1.0)
+        churn_scores = (
+            recency_risk * 0.35 +
+            value_risk * 0.25 +
+            frequency_risk * 0.25 +
+            payment_risk * 0.15
+        ) * 100
+        
+        # Labels and strategies are string work; build them per outlet
+        results = []
+        for outlet_id, churn_score, recency, value, frequency, payment in zip(
+            outlet_ids,
+            churn_scores.tolist(),
+            recency_risk.tolist(),
+            value_risk.tolist(),
+            frequency_risk.tolist(),
+            payment_risk.tolist()
+        ):
+            if churn_score > 70:
+                risk_level, risk_level_ar = "high", "عالي"
+            elif churn_score > 40:
+                risk_level, risk_level_ar = "medium", "متوسط"
+            else:
+                risk_level, risk_level_ar = "low", "منخفض"
+            
+            results.append({
+                "outlet_id": outlet_id,
+                "churn_score": round(churn_score, 2),
+                "risk_level": risk_level,
+                "risk_level_ar": risk_level_ar,
+                "risk_factors": {
+                    "recency": round(recency * 100, 2),
+                    "value": round(value * 100, 2),
+                    "frequency": round(frequency * 100, 2),
+                    "payment": round(payment * 100, 2)
+                },
+                "retention_strategies": self._get_retention_strategies(
+                    recency, value, frequency, payment
+                )
+            })
+        
+        return results
+    
     def _get_retention_strategies(
         self,
         recency_risk: float,
@@ -363,35 +584,47 @@ class InventoryOrchestrator:
         safety_stock_multiplier: float = 1.5
     ) -> List[Dict]:
         """Generate purchase order recommendations"""
-        recommendations = []
+        product_ids = list(current_inventory)
+        current_stocks = list(current_inventory.values())
+        stocks = np.array(current_stocks, dtype=float)
+        forecasted_demand = np.array(
+            [demand_forecast.get(product_id, 0) for product_id in product_ids], dtype=float
+        )
         
-        for product_id, current_stock in current_inventory.items():
-            forecasted_demand = demand_forecast.get(product_id, 0)
-            
-            # Calculate required stock
-            daily_demand = forecasted_demand / 30  # Assuming 30-day forecast
-            lead_time_demand = daily_demand * lead_time_days
-            safety_stock = daily_demand * 7 * safety_stock_multiplier  # 7 days safety
-            reorder_point = lead_time_demand + safety_stock
-            
-            # Calculate order quantity
-            if current_stock < reorder_point:
-                order_quantity = int((daily_demand * 30) - current_stock)  # 30 days supply
-                
-                recommendations.append({
-                    "product_id": product_id,
-                    "current_stock": current_stock,
-                    "forecasted_daily_demand": round(daily_demand, 2),
-                    "reorder_point": round(reorder_point, 2),
-                    "recommended_order_quantity": order_quantity,
-                    "urgency": "high" if current_stock < safety_stock else "medium",
-                    "days_until_stockout": int(current_stock / daily_demand) if daily_demand > 0 else 999,
-                    "reason_en": f"Stock below reorder point ({round(reorder_point, 2)} units)",
-                    "reason_ar": f"المخزون أقل من نقطة إعادة الطلب ({round(reorder_point, 2)} وحدة)"
-                })
+        # Calculate required stock for every product at once
+        daily_demand = forecasted_demand / 30  # Assuming 30-day forecast
+        lead_time_demand = daily_demand * lead_time_days
+        safety_stock = daily_demand * 7 * safety_stock_multiplier  # 7 days safety
+        reorder_point = lead_time_demand + safety_stock
+        
+        # Only products below their reorder point get a recommendation
+        below = np.flatnonzero(stocks < reorder_point)
+        order_quantity = (daily_demand[below] * 30 - stocks[below]).astype(int)  # 30 days supply
+        is_high = stocks[below] < safety_stock[below]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            days_until_stockout = np.where(
+                daily_demand[below] > 0, stocks[below] / daily_demand[below], 999
+            ).astype(int)
         
-        # Sort by urgency
-        recommendations.sort(key=lambda x: (x["urgency"] == "high", -x["days_until_stockout"]), reverse=True)
+        # Sort by urgency: high first, then soonest stockout (stable, like list.sort)
+        order = np.lexsort((days_until_stockout, ~is_high))
+        
+        recommendations = []
+        for i in order.tolist():
+            row = below[i]
+            daily = round(float(daily_demand[row]), 2)
+            reorder = round(float(reorder_point[row]), 2)
+            recommendations.append({
+                "product_id": product_ids[row],
+                "current_stock": current_stocks[row],
+                "forecasted_daily_demand": daily,
+                "reorder_point": reorder,
+                "recommended_order_quantity": int(order_quantity[i]),
+                "urgency": "high" if is_high[i] else "medium",
+                "days_until_stockout": int(days_until_stockout[i]),
+                "reason_en": f"Stock below reorder point ({reorder} units)",
+                "reason_ar": f"المخزون أقل من نقطة إعادة الطلب ({reorder} وحدة)"
+            })
         
         return recommendations
 
@@ -414,7 +647,35 @@ async def optimize_pricing(
     return {
         "status": "success",
         "optimization": result,
-        "generated_at": datetime.now().isoformat()
+        "generated_at": _now_iso()
+    }
+
+class PricingBatchRequest(BaseModel):
+    """Parallel arrays, one entry per product"""
+    product_ids: List[str] = Field(default_factory=list)
+    current_inventory: List[int] = Field(default_factory=list)
+    demand_forecast: List[float] = Field(default_factory=list)
+    competitor_prices: Optional[List[Optional[float]]] = None
+
+@app.post("/pricing/optimize-batch")
+async def optimize_pricing_batch(
+    request: PricingBatchRequest
+):
+    """DISTRIBUTIONLINC: Dynamic pricing optimization for many products"""
+    try:
+        results = pricing_optimizer.optimize_prices(
+            request.product_ids,
+            request.current_inventory,
+            request.demand_forecast,
+            request.competitor_prices
+        )
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    return {
+        "status": "success",
+        "optimizations": results,
+        "total_products": len(results),
+        "generated_at": _now_iso()
     }
 
 @app.get("/churn/predict")
@@ -433,20 +694,53 @@ async def predict_churn(
     return {
         "status": "success",
         "prediction": result,
-        "generated_at": datetime.now().isoformat()
+        "generated_at": _now_iso()
+    }
+
+class ChurnBatchRequest(BaseModel):
+    """Parallel arrays, one entry per outlet"""
+    outlet_ids: List[str] = Field(default_factory=list)
+    days_since_last_order: List[int] = Field(default_factory=list)
+    average_order_value: List[float] = Field(default_factory=list)
+    order_frequency: List[float] = Field(default_factory=list)
+    payment_delays: Optional[List[int]] = None
+
+@app.post("/churn/predict-batch")
+async def predict_churn_batch(
+    request: ChurnBatchRequest
+):
+    """DISTRIBUTIONLINC: Customer churn prediction for many outlets"""
+    try:
+        results = churn_predictor.predict_churn_risk_batch(
+            request.outlet_ids,
+            request.days_since_last_order,
+            request.average_order_value,
+            request.order_frequency,
+            request.payment_delays
+        )
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    return {
+        "status": "success",
+        "predictions": results,
+        "total_outlets": len(results),
+        "high_risk_count": sum(1 for r in results if r["risk_level"] == "high"),
+        "generated_at": _now_iso()
     }
 
+class RestockRequest(BaseModel):
+    """Stock on hand and 30-day demand forecast per product"""
+    current_inventory: Dict[str, int] = Field(default_factory=dict)
+    demand_forecast: Dict[str, float] = Field(default_factory=dict)
+    lead_time_days: int = 3
+
 @app.post("/inventory/restock-recommendations")
 async def get_restock_recommendations(
-    request: Dict
+    request: RestockRequest
 ):
     """DISTRIBUTIONLINC: Inventory orchestrator recommendations"""
-    current_inventory = request.get("current_inventory", {})
-    demand_forecast = request.get("demand_forecast", {})
-    lead_time_days = request.get("lead_time_days", 3)
-    
     recommendations = inventory_orchestrator.generate_restocking_recommendations(
-        current_inventory, demand_forecast, lead_time_days
+        request.current_inventory, request.demand_forecast, request.lead_time_days
     )
     
     return {
@@ -454,7 +748,7 @@ async def get_restock_recommendations(
         "recommendations": recommendations,
         "total_recommendations": len(recommendations),
         "high_urgency_count": sum(1 for r in recommendations if r["urgency"] == "high"),
-        "generated_at": datetime.now().isoformat()
+        "generated_at": _now_iso()
     }
 
 if __name__ == "__main__":
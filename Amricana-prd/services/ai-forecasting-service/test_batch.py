@@ -0,0 +1,186 @@
+"""
+BRAINSAIT: Tests for the batch pricing and churn paths
+Every batch result must equal the single-item result for the same inputs
+"""
+
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+from main import app, pricing_optimizer, churn_predictor
+
+client = TestClient(app)
+
+
+def _pricing_cases(n: int, seed: int = 7):
+    """Random pricing inputs, with every factor band boundary included"""
+    rng = random.Random(seed)
+    product_ids = ["PRD001", "PRD002", "PRD003", "PRD004", "PRD005", "PRD999"]
+    cases = [
+        (product_id, inventory, demand, competitor)
+        for product_id in ("PRD001", "PRD999")
+        for inventory in (0, 49, 50, 99, 100, 500, 501)
+        for demand in (0.0, 499.99, 500.0, 1000.0, 1000.01, 1500.0, 1500.01)
+        for competitor in (None, 0.0, 22.5, 25.0, 27.5, 28.0)
+    ]
+    cases += [
+        (
+            rng.choice(product_ids),
+            rng.randint(0, 1000),
+            round(rng.uniform(0, 2500), 2),
+            rng.choice([None, round(rng.uniform(10, 45), 2)])
+        )
+        for _ in range(n)
+    ]
+    return cases
+
+
+def _churn_cases(n: int, seed: int = 11):
+    """Random churn inputs, with every risk cap and threshold included"""
+    rng = random.Random(seed)
+    cases = [
+        ("OUT-EDGE", days, value, frequency, delays)
+        for days in (0, 15, 16, 30, 90)
+        for value in (0.0, 2500.0, 5000.0, 8000.0)
+        for frequency in (0.0, 2.0, 4.0, 6.0)
+        for delays in (0, 2, 3, 5, 9)
+    ]
+    cases += [
+        (
+            f"OUT{i:05d}",
+            rng.randint(0, 120),
+            round(rng.uniform(0, 8000), 2),
+            round(rng.uniform(0, 6), 2),
+            rng.randint(0, 8)
+        )
+        for i in range(n)
+    ]
+    return cases
+
+
+class TestPricingBatch:
+    """Test that optimize_prices matches optimize_price"""
+    
+    def test_optimize_prices_matches_optimize_price(self):
+        """Test batch results equal single results across the factor bands"""
+        cases = _pricing_cases(2000)
+        product_ids, inventory, demand, competitor = (list(column) for column in zip(*cases))
+        
+        results = pricing_optimizer.optimize_prices(product_ids, inventory, demand, competitor)
+        
+        assert results == [pricing_optimizer.optimize_price(*case) for case in cases]
+    
+    def test_optimize_prices_without_competitor_prices(self):
+        """Test that omitted competitor prices behave like None"""
+        results = pricing_optimizer.optimize_prices(["PRD002", "PRD003"], [30, 700], [1600.0, 400.0])
+        
+        assert results == [
+            pricing_optimizer.optimize_price("PRD002", 30, 1600.0),
+            pricing_optimizer.optimize_price("PRD003", 700, 400.0)
+        ]
+    
+    def test_optimize_prices_empty_and_single(self):
+        """Test empty input and a single product"""
+        assert pricing_optimizer.optimize_prices([], [], [], []) == []
+        assert pricing_optimizer.optimize_prices(["PRD001"], [100], [1500.0], [26.5]) == [
+            pricing_optimizer.optimize_price("PRD001", 100, 1500.0, 26.5)
+        ]
+    
+    def test_optimize_prices_length_mismatch(self):
+        """Test that parallel arrays of different lengths are rejected"""
+        with pytest.raises(ValueError):
+            pricing_optimizer.optimize_prices(["PRD001", "PRD002"], [100], [1500.0])
+    
+    def test_optimize_batch_endpoint(self):
+        """Test the batch endpoint against the single-product endpoint"""
+        response = client.post("/pricing/optimize-batch", json={})
+        assert response.status_code == 200
+        assert response.json()["optimizations"] == []
+        assert response.json()["total_products"] == 0
+        
+        response = client.post("/pricing/optimize-batch", json={
+            "product_ids": ["PRD001", "PRD004"],
+            "current_inventory": [40, 600],
+            "demand_forecast": [1200.0, 300.0],
+            "competitor_prices": [30.0, None]
+        })
+        data = response.json()
+        assert data["status"] == "success"
+        assert data["total_products"] == 2
+        single = client.get(
+            "/pricing/optimize?product_id=PRD001&current_inventory=40&demand_forecast=1200&competitor_price=30"
+        ).json()
+        assert data["optimizations"][0] == single["optimization"]
+        
+        response = client.post("/pricing/optimize-batch", json={
+            "product_ids": ["PRD001"], "current_inventory": [], "demand_forecast": []
+        })
+        assert response.json()["status"] == "error"
+
+
+class TestChurnBatch:
+    """Test that predict_churn_risk_batch matches predict_churn_risk"""
+    
+    def test_batch_matches_single(self):
+        """Test batch results equal single results across caps and thresholds"""
+        cases = _churn_cases(2000)
+        outlet_ids, days, value, frequency, delays = (list(column) for column in zip(*cases))
+        
+        results = churn_predictor.predict_churn_risk_batch(outlet_ids, days, value, frequency, delays)
+        
+        assert results == [churn_predictor.predict_churn_risk(*case) for case in cases]
+        assert {r["risk_level"] for r in results} == {"low", "medium", "high"}
+    
+    def test_batch_without_payment_delays(self):
+        """Test that omitted payment delays behave like zero"""
+        results = churn_predictor.predict_churn_risk_batch(["OUT001"], [45], [2500.0], [2.0])
+        
+        assert results == [churn_predictor.predict_churn_risk("OUT001", 45, 2500.0, 2.0, 0)]
+    
+    def test_batch_empty_and_single(self):
+        """Test empty input and a single outlet"""
+        assert churn_predictor.predict_churn_risk_batch([], [], [], [], []) == []
+        assert churn_predictor.predict_churn_risk_batch(["OUT002"], [90], [800.0], [0.5], [4]) == [
+            churn_predictor.predict_churn_risk("OUT002", 90, 800.0, 0.5, 4)
+        ]
+    
+    def test_batch_length_mismatch(self):
+        """Test that parallel arrays of different lengths are rejected"""
+        with pytest.raises(ValueError):
+            churn_predictor.predict_churn_risk_batch(["OUT001", "OUT002"], [45], [2500.0], [2.0])
+    
+    def test_predict_batch_endpoint(self):
+        """Test the batch endpoint against the single-outlet endpoint"""
+        response = client.post("/churn/predict-batch", json={})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["predictions"] == []
+        assert data["total_outlets"] == 0
+        assert data["high_risk_count"] == 0
+        
+        response = client.post("/churn/predict-batch", json={
+            "outlet_ids": ["OUT001", "OUT002"],
+            "days_since_last_order": [45, 90],
+            "average_order_value": [2500.0, 800.0],
+            "order_frequency": [2.0, 0.5],
+            "payment_delays": [1, 5]
+        })
+        data = response.json()
+        assert data["status"] == "success"
+        assert data["total_outlets"] == 2
+        assert data["high_risk_count"] == 1
+        single = client.get(
+            "/churn/predict?outlet_id=OUT001&days_since_last_order=45&average_order_value=2500"
+            "&order_frequency=2&payment_delays=1"
+        ).json()
+        assert data["predictions"][0] == single["prediction"]
+        
+        response = client.post("/churn/predict-batch", json={
+            "outlet_ids": ["OUT001"], "days_since_last_order": [], "average_order_value": [],
+            "order_frequency": []
+        })
+        assert response.json()["status"] == "error"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])